@@ -5,36 +5,395 @@ FASTA文件字符清理脚本
 """
 
 import argparse
+import gzip
+import io
+import struct
 import sys
 import os
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+# 每次读取/写出的数据块大小
+BLOCK_SIZE = 16 * 1024 * 1024
+# 并行模式下每个分片的目标大小
+SHARD_SIZE = 64 * 1024 * 1024
+# 以这些后缀结尾的输出文件写为BGZF格式
+BGZF_SUFFIXES = ('.gz', '.bgz')
+# 每个BGZF块的最大未压缩数据量（与htslib一致）
+BGZF_BLOCK_SIZE = 0xff00
+# BGZF文件结尾的空块
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
 
-def clean_fasta(input_file, output_file, chars_to_remove):
+
+def is_gzip_file(path):
+    """根据文件头判断是否为gzip/BGZF压缩文件"""
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+def open_fasta_input(path):
+    """以二进制模式打开输入文件，gzip/BGZF压缩文件自动解压"""
+    if is_gzip_file(path):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_fasta_output(path, threads=1, index=False):
+    """
+    以二进制模式打开输出文件，以 .gz/.bgz 结尾时写为BGZF格式
+
+    index: 为BGZF输出同时写出 samtools 使用的 .gzi 索引
+    """
+    if path.endswith(BGZF_SUFFIXES):
+        gzi_path = path + '.gzi' if index else None
+        return io.BufferedWriter(BgzfWriter(open(path, 'wb'), threads, gzi_path=gzi_path), BLOCK_SIZE)
+    return open(path, 'wb')
+
+
+def compress_bgzf_block(data, level=6):
+    """把不超过 BGZF_BLOCK_SIZE 字节的数据压缩为一个完整的BGZF块"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff,
+                         6, ord('B'), ord('C'), 2, len(cdata) + 25)
+    return header + cdata + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+class BgzfWriter(io.RawIOBase):
+    """
+    BGZF格式写出器，各数据块在线程池中并行压缩，按原始顺序写出
+
+    输出可以直接用 samtools faidx / tabix 建立索引；指定 gzi_path 时
+    同时记录每个块的压缩/未压缩偏移量，关闭时写出 .gzi 索引
+    """
+
+    def __init__(self, raw, threads=1, level=6, gzi_path=None):
+        self._raw = raw
+        self._level = level
+        self._threads = threads
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self._gzi_path = gzi_path
+        self._offsets = []
+        self._compressed_pos = 0
+        self._uncompressed_pos = 0
+
+    def writable(self):
+        return True
+
+    def _write_block(self, block, size):
+        if self._uncompressed_pos:
+            self._offsets.append((self._compressed_pos, self._uncompressed_pos))
+        self._raw.write(block)
+        self._compressed_pos += len(block)
+        self._uncompressed_pos += size
+
+    def _submit(self, data):
+        if self._executor is None:
+            self._write_block(compress_bgzf_block(data, self._level), len(data))
+            return
+        self._pending.append((self._executor.submit(compress_bgzf_block, data, self._level), len(data)))
+        while len(self._pending) > self._threads * 4:
+            future, size = self._pending.popleft()
+            self._write_block(future.result(), size)
+
+    def write(self, data):
+        self._buffer += data
+        full = len(self._buffer) - len(self._buffer) % BGZF_BLOCK_SIZE
+        with memoryview(self._buffer) as view:
+            for pos in range(0, full, BGZF_BLOCK_SIZE):
+                self._submit(bytes(view[pos:pos + BGZF_BLOCK_SIZE]))
+        del self._buffer[:full]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                future, size = self._pending.popleft()
+                self._write_block(future.result(), size)
+            self._raw.write(BGZF_EOF)
+            if self._gzi_path:
+                with open(self._gzi_path, 'wb') as f:
+                    f.write(struct.pack('<Q', len(self._offsets)))
+                    for offsets in self._offsets:
+                        f.write(struct.pack('<QQ', *offsets))
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._raw.close()
+            super().close()
+
+
+def iter_line_blocks(infile, block_size=BLOCK_SIZE, limit=None):
+    """
+    以大数据块读取二进制文件，每个数据块都以完整的行结束（文件最后一块除外）
+
+    limit: 最多读取的字节数，None 表示读到文件末尾
+    """
+    rest = b''
+    while True:
+        if limit is None:
+            block = infile.read(block_size)
+        else:
+            block = infile.read(min(block_size, limit))
+            limit -= len(block)
+        if not block:
+            break
+        block = rest + block
+        cut = block.rfind(b'\n') + 1
+        if cut == 0:
+            rest = block
+            continue
+        rest = block[cut:]
+        yield block[:cut]
+    if rest:
+        yield rest
+
+
+def clean_block(block, delete):
+    """
+    清理一个由完整行组成的数据块
+
+    序列名称行（以>开头）原样保留（去掉行尾的\r），
+    序列数据用 bytes.translate 一次性删除 delete 中的字节
+
+    参数:
+    block: 二进制数据块
+    delete: 要删除的字节（不含换行符）
+    """
+    if not block.endswith(b'\n'):
+        block += b'\n'
+    if b'>' not in block:
+        return block.translate(None, delete)
+
+    out = []
+    pos = 0
+    size = len(block)
+    while pos < size:
+        if block.startswith(b'>', pos):
+            end = block.index(b'\n', pos) + 1
+            out.append(block[pos:end].rstrip(b'\r\n') + b'\n')
+        else:
+            end = block.find(b'\n>', pos) + 1 or size
+            out.append(block[pos:end].translate(None, delete))
+        pos = end
+    return b''.join(out)
+
+
+class FastaRewrapper:
+    """
+    流式清理序列数据并按固定宽度重新折行，同时记录每条序列的 .fai 索引信息
+
+    依次把由完整行组成的数据块传给 feed()，最后调用 finish() 取得剩余数据；
+    entries 中的偏移量相对于本对象输出的第一个字节
+    """
+
+    def __init__(self, delete, width):
+        self.delete = delete + b'\n'
+        self.width = width
+        self.entries = []  # [name, length, offset]
+        self.position = 0
+        self._record = None
+        self._residue = b''
+
+    def _write(self, out, data):
+        out.append(data)
+        self.position += len(data)
+
+    def _wrap(self, out, seq, final=False):
+        data = self._residue + seq
+        width = self.width
+        size = len(data) if final else len(data) - len(data) % width
+        self._residue = data[size:]
+        if size:
+            self._write(out, b'\n'.join([data[i:i + width] for i in range(0, size, width)]) + b'\n')
+
+    def _end_record(self, out):
+        self._wrap(out, b'', final=True)
+        if self._record is not None and self._record[1]:
+            self.entries.append(self._record)
+        self._record = None
+
+    def feed(self, block):
+        if not block.endswith(b'\n'):
+            block += b'\n'
+        out = []
+        pos = 0
+        size = len(block)
+        while pos < size:
+            if block.startswith(b'>', pos):
+                end = block.index(b'\n', pos) + 1
+                self._end_record(out)
+                header = block[pos:end].rstrip(b'\r\n') + b'\n'
+                self._write(out, header)
+                name = (header[1:].split() or [b''])[0].decode('ascii', 'replace')
+                self._record = [name, 0, self.position]
+            else:
+                end = block.find(b'\n>', pos) + 1 or size
+                seq = block[pos:end].translate(None, self.delete)
+                if self._record is not None:
+                    self._record[1] += len(seq)
+                self._wrap(out, seq)
+            pos = end
+        return b''.join(out)
+
+    def finish(self):
+        out = []
+        self._end_record(out)
+        return b''.join(out)
+
+
+def write_fai(path, entries, width):
+    """按 samtools faidx 的格式写出 .fai 索引（name, length, offset, linebases, linebytes）"""
+    with open(path, 'w') as f:
+        for name, length, offset in entries:
+            linebases = min(length, width)
+            f.write(f"{name}\t{length}\t{offset}\t{linebases}\t{linebases + 1}\n")
+
+
+def clean_fasta_stream(infile, outfile, chars_to_remove, block_size=BLOCK_SIZE, width=None):
+    """
+    以二进制大数据块流式清理FASTA，按块写出
+
+    参数:
+    infile: 以二进制模式打开的输入文件
+    outfile: 以二进制模式打开的输出文件
+    chars_to_remove: 要删除的字符字符串（仅限ASCII字符）
+    width: 序列行重新折行的宽度，None 表示保持原有的行
+
+    返回: 按 width 折行时返回 .fai 索引信息，否则返回空列表
+    """
+    delete = (chars_to_remove + '\r').replace('\n', '').encode('ascii')
+    if width is None:
+        for block in iter_line_blocks(infile, block_size):
+            outfile.write(clean_block(block, delete))
+        return []
+
+    rewrapper = FastaRewrapper(delete, width)
+    for block in iter_line_blocks(infile, block_size):
+        outfile.write(rewrapper.feed(block))
+    outfile.write(rewrapper.finish())
+    return rewrapper.entries
+
+
+def find_record_bounds(path, n_shards):
+    """
+    把文件切分为 n_shards 个左右的字节区间，每个区间的起点都是一条记录（>行）的开头
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, n_shards):
+            pos = size * i // n_shards
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()  # 跳过不完整的行，它属于上一个区间
+
+            # 向后查找下一条记录的开头
+            while True:
+                line_start = f.tell()
+                line = f.readline()
+                if not line or line.startswith(b'>'):
+                    break
+
+            if bounds[-1] < line_start < size:
+                bounds.append(line_start)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _clean_shard(task):
+    """在子进程中清理一个字节区间，返回清理后的数据和分片内的 .fai 索引信息"""
+    path, start, end, delete, width = task
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        blocks = iter_line_blocks(infile, limit=end - start)
+        if width is None:
+            return b''.join(clean_block(block, delete) for block in blocks), []
+        rewrapper = FastaRewrapper(delete, width)
+        data = b''.join(rewrapper.feed(block) for block in blocks) + rewrapper.finish()
+        return data, rewrapper.entries
+
+
+def clean_fasta_parallel(input_file, outfile, chars_to_remove, threads, width=None):
+    """
+    按记录边界把文件切分为多个分片，在进程池中并行清理，并按原始顺序写出
+
+    删除字符后每个分片的输出大小无法预先知道，因此按顺序拼接写出；
+    同时在处理中的分片数量有上限，内存占用与文件大小无关。
+    每个分片都从一条记录的开头开始，可以独立折行，
+    分片内的 .fai 偏移量加上已写出的字节数即为文件中的偏移量
+
+    参数:
+    input_file: 输入FASTA文件路径（未压缩的普通文件）
+    outfile: 以二进制模式打开的输出文件
+    chars_to_remove: 要删除的字符字符串（仅限ASCII字符）
+    threads: 进程数
+    width: 序列行重新折行的宽度，None 表示保持原有的行
+
+    返回: 按 width 折行时返回 .fai 索引信息，否则返回空列表
+    """
+    delete = (chars_to_remove + '\r').replace('\n', '').encode('ascii')
+    n_shards = max(threads * 4, os.path.getsize(input_file) // SHARD_SIZE)
+    shards = find_record_bounds(input_file, n_shards)
+    entries = []
+    written = 0
+
+    def write_shard(future):
+        nonlocal written
+        data, shard_entries = future.result()
+        entries.extend([name, length, offset + written] for name, length, offset in shard_entries)
+        outfile.write(data)
+        written += len(data)
+
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for start, end in shards:
+            pending.append(executor.submit(_clean_shard, (input_file, start, end, delete, width)))
+            if len(pending) >= threads * 2:
+                write_shard(pending.popleft())
+        while pending:
+            write_shard(pending.popleft())
+    return entries
+
+
+def clean_fasta(input_file, output_file, chars_to_remove, threads=1, width=None, fai=False):
     """
     清理FASTA文件中的特定字符
     
     参数:
-    input_file: 输入FASTA文件路径
-    output_file: 输出FASTA文件路径
+    input_file: 输入FASTA文件路径（可以是gzip/BGZF压缩文件）
+    output_file: 输出FASTA文件路径（以 .gz/.bgz 结尾时写为BGZF格式）
     chars_to_remove: 要删除的字符字符串
+    threads: 并行进程数，大于1时按记录分片并行处理，并用于BGZF并行压缩；
+             压缩输入只能顺序解压，此时只并行压缩输出
+    width: 序列行重新折行的宽度，None 表示保持原有的行
+    fai: 同时写出 samtools faidx 格式的索引（需要指定 width），BGZF输出还会写出 .gzi
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as infile, \
-             open(output_file, 'w', encoding='utf-8') as outfile:
-            
-            for line in infile:
-                line = line.rstrip('\n\r')  # 移除行尾换行符
-                
-                # 如果是序列名称行（以>开头），直接写入，不做任何修改
-                if line.startswith('>'):
-                    outfile.write(line + '\n')
-                else:
-                    # 序列数据行，删除指定字符
-                    cleaned_line = line
-                    for char in chars_to_remove:
-                        cleaned_line = cleaned_line.replace(char, '')
-                    outfile.write(cleaned_line + '\n')
-                    
+        with open_fasta_output(output_file, threads, index=fai) as outfile:
+            if not chars_to_remove.isascii():
+                with open_fasta_input(input_file) as infile:
+                    clean_fasta_text(infile, outfile, chars_to_remove)
+                entries = []
+            elif threads > 1 and not is_gzip_file(input_file):
+                entries = clean_fasta_parallel(input_file, outfile, chars_to_remove, threads, width)
+            else:
+                with open_fasta_input(input_file) as infile:
+                    entries = clean_fasta_stream(infile, outfile, chars_to_remove, width=width)
+
+        if fai:
+            write_fai(output_file + '.fai', entries, width)
+            print(f"索引文件: {output_file}.fai")
+
         print(f"成功处理文件: {input_file} -> {output_file}")
         print(f"删除的字符: {chars_to_remove}")
         
@@ -49,6 +408,32 @@ def clean_fasta(input_file, output_file, chars_to_remove):
         sys.exit(1)
 
 
+def clean_fasta_text(infile, outfile, chars_to_remove):
+    """
+    逐行按文本方式清理FASTA（要删除的字符包含非ASCII字符时使用）
+    
+    参数:
+    infile: 以二进制模式打开的输入文件
+    outfile: 以二进制模式打开的输出文件
+    chars_to_remove: 要删除的字符字符串
+    """
+    with io.TextIOWrapper(infile, encoding='utf-8') as infile, \
+         io.TextIOWrapper(outfile, encoding='utf-8') as outfile:
+        
+        for line in infile:
+            line = line.rstrip('\n\r')  # 移除行尾换行符
+            
+            # 如果是序列名称行（以>开头），直接写入，不做任何修改
+            if line.startswith('>'):
+                outfile.write(line + '\n')
+            else:
+                # 序列数据行，删除指定字符
+                cleaned_line = line
+                for char in chars_to_remove:
+                    cleaned_line = cleaned_line.replace(char, '')
+                outfile.write(cleaned_line + '\n')
+
+
 def main():
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(
@@ -65,7 +450,7 @@ def main():
     parser.add_argument(
         '-i', '--input',
         required=True,
-        help='输入FASTA文件路径'
+        help='输入FASTA文件路径（支持gzip/BGZF压缩文件）'
     )
     
     parser.add_argument(
@@ -77,7 +462,26 @@ def main():
     parser.add_argument(
         '-o', '--output',
         required=True,
-        help='输出FASTA文件路径'
+        help='输出FASTA文件路径（以 .gz/.bgz 结尾时输出BGZF压缩文件）'
+    )
+    
+    parser.add_argument(
+        '-w', '--width',
+        type=int,
+        help='按固定宽度重新折行序列（如: 60），默认保持原有的行'
+    )
+    
+    parser.add_argument(
+        '--fai',
+        action='store_true',
+        help='同时写出 samtools faidx 格式的 .fai 索引（需要 --width；BGZF输出还会写出 .gzi）'
+    )
+    
+    parser.add_argument(
+        '-t', '--threads',
+        type=int,
+        default=1,
+        help='并行进程数，按记录边界分片处理，同时用于BGZF并行压缩（默认: 1）'
     )
     
     # 解析命令行参数
@@ -94,8 +498,24 @@ def main():
         print(f"错误: 输出目录 '{output_dir}' 不存在", file=sys.stderr)
         sys.exit(1)
     
+    if args.threads < 1:
+        print("错误: --threads 必须大于等于1", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.width is not None and args.width < 1:
+        print("错误: --width 必须大于等于1", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.fai and args.width is None:
+        print("错误: --fai 需要同时指定 --width，保证每条序列的行长一致", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.width is not None and not args.string.isascii():
+        print("错误: --width/--fai 只支持删除ASCII字符", file=sys.stderr)
+        sys.exit(1)
+    
     # 执行清理操作
-    clean_fasta(args.input, args.output, args.string)
+    clean_fasta(args.input, args.output, args.string, args.threads, args.width, args.fai)
 
 
 if __name__ == '__main__':
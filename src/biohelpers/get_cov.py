@@ -1,8 +1,398 @@
 import argparse
+import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 import pysam
-import pysamstats
+
+# Reads skipped by the default pileup filter (as used by pysamstats):
+# unmapped, secondary, QC fail and duplicate
+SKIP_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+DEFAULT_CHUNK_SIZE = 20_000_000
+
+# AlignmentFile handle of the current worker process
+_worker_bam = None
+
+
+def read_depth(bam, chrom, start, end, batch=1_000_000):
+    """Per-base read depth of chrom[start:end) (0-based) as an int32 array
+
+    Every read adds +1 at its reference start and -1 at its reference end
+    (deletions and spliced gaps count as covered, like pileup `reads_all`);
+    the depth is the cumulative sum of these events.
+    """
+    length = end - start
+    events = np.zeros(length + 1, dtype=np.int64)
+    starts = []
+    ends = []
+
+    def flush():
+        s = np.clip(np.array(starts, dtype=np.int64) - start, 0, length)
+        e = np.clip(np.array(ends, dtype=np.int64) - start, 0, length)
+        events[:] += np.bincount(s, minlength=length + 1)
+        events[:] -= np.bincount(e, minlength=length + 1)
+        starts.clear()
+        ends.clear()
+
+    for read in bam.fetch(chrom, start, end):
+        if read.flag & SKIP_FLAGS:
+            continue
+        starts.append(read.reference_start)
+        ends.append(read.reference_end)
+        if len(starts) >= batch:
+            flush()
+    flush()
+
+    return np.cumsum(events[:-1]).astype(np.int32)
+
+
+def pysamstats_depth(bam, chrom, start, end):
+    """Per-base read depth of chrom[start:end) from pysamstats (slow, one record per base)"""
+    import pysamstats
+
+    depth = np.zeros(end - start, dtype=np.int32)
+    for record in pysamstats.stat_coverage(bam, chrom=chrom, start=start, end=end, pad=True):
+        depth[record["pos"] - start] = record["reads_all"]
+    return depth
+
+
+ENGINES = {"numpy": read_depth, "pysamstats": pysamstats_depth}
+
+
+class DepthCache:
+    """Per-chromosome depth arrays stored as memory-mapped .npy files next to the BAM
+
+    The cache is keyed by the BAM size and mtime (and the depth engine);
+    meta.json is written last, so an interrupted run never leaves a cache
+    that looks valid. Workers fill their own slices of the arrays.
+    """
+
+    VERSION = 1
+
+    def __init__(self, bam_path, engine):
+        self.bam_path = bam_path
+        self.engine = engine
+        self.directory = f"{bam_path}.depth_cache"
+        self.ready = False
+
+    def _stamp(self):
+        stat = os.stat(self.bam_path)
+        return {
+            "version": self.VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "engine": self.engine,
+        }
+
+    def _array_path(self, tid):
+        return os.path.join(self.directory, f"{tid}.npy")
+
+    def prepare(self, bam, allocate=True):
+        """Check the cache, or allocate empty arrays to be filled during this run"""
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                self.ready = json.load(f) == self._stamp()
+        except (OSError, ValueError):
+            self.ready = False
+        if self.ready or not allocate:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for tid, length in enumerate(bam.lengths):
+            np.lib.format.open_memmap(
+                self._array_path(tid), mode="w+", dtype=np.int32, shape=(length,)
+            ).flush()
+
+    def finish(self):
+        """Mark the arrays filled during this run as a valid cache"""
+        if not self.ready:
+            with open(os.path.join(self.directory, "meta.json"), "w") as f:
+                json.dump(self._stamp(), f)
+            self.ready = True
+
+    def read(self, bam, chrom, start, end):
+        return np.load(self._array_path(bam.get_tid(chrom)), mmap_mode="r")[start:end]
+
+    def write(self, bam, chrom, start, depth):
+        array = np.load(self._array_path(bam.get_tid(chrom)), mmap_mode="r+")
+        array[start:start + len(depth)] = depth
+        array.flush()
+
+
+def region_depth(bam, chrom, start, end, engine, cache=None):
+    """Depth of chrom[start:end) from the cache when valid, otherwise from the alignments"""
+    if cache is not None and cache.ready:
+        return cache.read(bam, chrom, start, end)
+    depth = ENGINES[engine](bam, chrom, start, end)
+    if cache is not None:
+        cache.write(bam, chrom, start, depth)
+    return depth
+
+
+def coverage_runs(depth, thresholds):
+    """Find maximal runs with depth >= threshold, for every threshold from one depth array
+
+    Return one (starts, ends, sums) tuple per threshold: 0-based half-open
+    offsets into `depth` and the summed depth of each run, so mean coverage is
+    sums / (ends - starts). The prefix sum is shared by all thresholds.
+    """
+    cumulative = np.concatenate(([0], np.cumsum(depth, dtype=np.int64)))
+    mask = np.zeros(len(depth) + 2, dtype=bool)
+    runs = []
+    for threshold in thresholds:
+        np.greater_equal(depth, threshold, out=mask[1:-1])
+        edges = np.flatnonzero(mask[1:] != mask[:-1])
+        starts, ends = edges[0::2], edges[1::2]
+        runs.append((starts, ends, cumulative[ends] - cumulative[starts]))
+    return runs
+
+
+def bin_means(depth, bin_size):
+    """Mean depth of consecutive bin_size windows, return (starts, ends, means) offsets into depth"""
+    starts = np.arange(0, len(depth), bin_size)
+    ends = np.minimum(starts + bin_size, len(depth))
+    if len(depth) == 0:
+        return starts, ends, np.zeros(0)
+    sums = np.add.reduceat(depth.astype(np.int64), starts)
+    return starts, ends, sums / (ends - starts)
+
+
+def split_regions(bam, chunk_size):
+    """Split every reference into (chrom, start, end) sub-regions of at most chunk_size bases"""
+    regions = []
+    for chrom in bam.references:
+        chrom_len = bam.get_reference_length(chrom)
+        for start in range(0, chrom_len, chunk_size):
+            regions.append((chrom, start, min(start + chunk_size, chrom_len)))
+    return regions
+
+
+def _init_worker(bam_path):
+    global _worker_bam
+    _worker_bam = pysam.AlignmentFile(bam_path, "rb")
+
+
+def region_coverage(task):
+    """Worker: coverage runs (and bins) of one region from a single depth array
+
+    Return (chrom, runs, bins) in chromosome coordinates; runs holds one
+    (starts, ends, sums) tuple per threshold, bins are (starts, ends, means) or None.
+    """
+    chrom, start, end, engine, thresholds, bin_size, cache = task
+    depth = region_depth(_worker_bam, chrom, start, end, engine, cache)
+    runs = [
+        (starts + start, ends + start, sums)
+        for starts, ends, sums in coverage_runs(depth, thresholds)
+    ]
+    bins = None
+    if bin_size:
+        bin_starts, bin_ends, means = bin_means(depth, bin_size)
+        bins = (bin_starts + start, bin_ends + start, means)
+    return chrom, runs, bins
+
+
+def iter_region_results(bam_path, tasks, func, threads):
+    """Run func over tasks with one AlignmentFile per process, yield results in task order"""
+    if threads > 1:
+        with ProcessPoolExecutor(
+            max_workers=threads, initializer=_init_worker, initargs=(bam_path,)
+        ) as executor:
+            yield from executor.map(func, tasks)
+    else:
+        _init_worker(bam_path)
+        for task in tasks:
+            yield func(task)
+
+
+class RunMerger:
+    """Join runs of consecutive sub-regions that touch across the region boundary"""
+
+    def __init__(self):
+        self.pending = None
+
+    def add(self, chrom, starts, ends, sums):
+        """Add the runs of the next region, return the (chrom, start, end, sum) runs now complete"""
+        done = []
+        pending = self.pending
+        for start, end, total in zip(starts.tolist(), ends.tolist(), sums.tolist()):
+            if pending is not None and pending[0] == chrom and pending[2] == start:
+                pending = (chrom, pending[1], end, pending[3] + total)
+                continue
+            if pending is not None:
+                done.append(pending)
+            pending = (chrom, start, end, total)
+        self.pending = pending
+        return done
+
+    def flush(self):
+        done = [self.pending] if self.pending is not None else []
+        self.pending = None
+        return done
+
+
+def read_targets(bed_path, bam):
+    """Read a BED file, return its intervals merged and sorted in BAM reference order
+
+    Overlapping and book-ended intervals are merged. Return a list of (chrom, start, end).
+    """
+    intervals = {}
+    with open(bed_path) as f:
+        for line in f:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            intervals.setdefault(fields[0], []).append((int(fields[1]), int(fields[2])))
+
+    unknown = set(intervals) - set(bam.references)
+    if unknown:
+        print(f"Warning: skipping targets on unknown references: {', '.join(sorted(unknown))}", file=sys.stderr)
+
+    targets = []
+    for chrom in bam.references:
+        merged = []
+        for start, end in sorted(intervals.get(chrom, [])):
+            end = min(end, bam.get_reference_length(chrom))
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        targets.extend((chrom, start, end) for start, end in merged)
+    return targets
+
+
+def batch_targets(targets, batch_size):
+    """Group consecutive targets of one chromosome into batches of about batch_size bases"""
+    batches = []
+    batch_len = 0
+    for chrom, start, end in targets:
+        if not batches or batches[-1][0] != chrom or batch_len >= batch_size:
+            batches.append((chrom, []))
+            batch_len = 0
+        batches[-1][1].append((start, end))
+        batch_len += end - start
+    return batches
+
+
+def target_stats(bam, chrom, start, end, engine, thresholds, chunk_size, cache=None):
+    """Summed depth, minimum depth and number of bases >= each threshold of one target
+
+    Return (sum, min, [covered, ...]). Only reads overlapping the target are
+    fetched (index seek); long targets are processed in chunk_size pieces.
+    """
+    total = 0
+    minimum = None
+    covered = [0] * len(thresholds)
+    for piece_start in range(start, end, chunk_size):
+        depth = region_depth(bam, chrom, piece_start, min(piece_start + chunk_size, end), engine, cache)
+        total += int(depth.sum(dtype=np.int64))
+        piece_min = int(depth.min())
+        minimum = piece_min if minimum is None else min(minimum, piece_min)
+        for i, threshold in enumerate(thresholds):
+            covered[i] += int(np.count_nonzero(depth >= threshold))
+    return total, minimum, covered
+
+
+def batch_target_stats(task):
+    """Worker: (chrom, [(start, end, sum, min, [covered, ...]), ...]) for one batch of targets"""
+    chrom, intervals, engine, thresholds, chunk_size, cache = task
+    return chrom, [
+        (start, end) + target_stats(_worker_bam, chrom, start, end, engine, thresholds, chunk_size, cache)
+        for start, end in intervals
+    ]
+
+
+def matrix_windows(bam, bin_size):
+    """Windows of the coverage matrix: fixed bins, or whole chromosomes without bin_size
+
+    Return a list of (chrom, start, end).
+    """
+    windows = []
+    for chrom in bam.references:
+        chrom_len = bam.get_reference_length(chrom)
+        step = bin_size or chrom_len
+        for start in range(0, chrom_len, step):
+            windows.append((chrom, start, min(start + step, chrom_len)))
+    return windows
+
+
+def sample_window_means(task):
+    """Worker: mean coverage of every matrix window for one BAM, as a float32 vector"""
+    bam_path, windows, engine, bin_size, chunk_size, cache, targeted = task
+    sums = np.zeros(len(windows), dtype=np.float64)
+
+    if targeted:
+        # Arbitrary target windows: seek to every window through the index
+        with pysam.AlignmentFile(bam_path, "rb") as bam:
+            for index, (chrom, start, end) in enumerate(windows):
+                sums[index] = target_stats(bam, chrom, start, end, engine, [], chunk_size, cache)[0]
+        lengths = np.array([end - start for _, start, end in windows], dtype=np.float64)
+        return (sums / lengths).astype(np.float32)
+
+    # First window index of every chromosome
+    first_window = {}
+    for index, (chrom, _, _) in enumerate(windows):
+        first_window.setdefault(chrom, index)
+
+    with pysam.AlignmentFile(bam_path, "rb") as bam:
+        for chrom, start, end in split_regions(bam, chunk_size):
+            depth = region_depth(bam, chrom, start, end, engine, cache)
+            if bin_size:
+                offset = first_window[chrom] + start // bin_size
+                bin_sums = np.add.reduceat(depth.astype(np.int64), np.arange(0, len(depth), bin_size))
+                sums[offset:offset + len(bin_sums)] += bin_sums
+            else:
+                sums[first_window[chrom]] += depth.sum(dtype=np.int64)
+
+    lengths = np.array([end - start for _, start, end in windows], dtype=np.float64)
+    return (sums / lengths).astype(np.float32)
+
+
+def sample_name(bam_path):
+    """Sample name from a BAM path, e.g. data/S1.sorted.bam -> S1"""
+    name = os.path.basename(bam_path)
+    for suffix in (".bam", ".sam", ".sorted"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name
+
+
+def coverage_matrix(bam_paths, windows, engine, bin_size, chunk_size, threads, caches=None, targeted=False):
+    """Window x sample mean-coverage matrix (float32), samples processed in parallel"""
+    matrix = np.zeros((len(windows), len(bam_paths)), dtype=np.float32)
+    caches = caches or [None] * len(bam_paths)
+    tasks = [
+        (path, windows, engine, bin_size, chunk_size, cache, targeted)
+        for path, cache in zip(bam_paths, caches)
+    ]
+    with ProcessPoolExecutor(max_workers=max(1, min(threads, len(tasks)))) as executor:
+        futures = {executor.submit(sample_window_means, task): column for column, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            matrix[:, futures[future]] = future.result()
+    return matrix
+
+
+def write_coverage_matrix(fh, windows, names, matrix):
+    """Write the coverage matrix as a TSV table: chr, start, end, one column per sample"""
+    import pandas as pd
+
+    table = pd.DataFrame(matrix, columns=names)
+    table.insert(0, "end", [end for _, _, end in windows])
+    table.insert(0, "start", [start for _, start, _ in windows])
+    table.insert(0, "chr", [chrom for chrom, _, _ in windows])
+    table.to_csv(fh, sep="\t", index=False, float_format="%.2f", lineterminator="\n")
+
+
+def threshold_output_path(output, threshold):
+    """Per-threshold output path, e.g. sample.cov.bed -> sample.cov.m10.bed"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.m{threshold}{ext}"
 
 
 def main():
@@ -15,67 +405,202 @@ def main():
         "-s",
         "--sam",
         required=True,
-        help="Input SAM/BAM file path (must be sorted and indexed)",
+        nargs="+",
+        help="Input SAM/BAM file path (must be sorted and indexed)\n"
+        "Several BAMs: write a window x sample mean-coverage matrix\n"
+        "(windows from --bin-size, or whole chromosomes)",
     )
     parser.add_argument(
         "-m",
         "--min_coverage",
         type=int,
-        default=0,
-        help="Minimum mean coverage threshold (default: 0)",
+        nargs="+",
+        default=[0],
+        help="Minimum mean coverage threshold(s) (default: 0)\n"
+        "Several thresholds are computed in one pass and written to\n"
+        "one BED per threshold ([OUTPUT].m[THRESHOLD].bed)",
     )
     parser.add_argument("-o", "--output", help="Output file path (default: stdout)")
+    parser.add_argument(
+        "-b",
+        "--bin-size",
+        type=int,
+        help="Also report mean coverage in fixed windows of this size (e.g. 1000)",
+    )
+    parser.add_argument(
+        "--bin-output",
+        help="Output file path for window means (required with --bin-size)",
+    )
+    parser.add_argument(
+        "-r",
+        "--regions",
+        help="BED file of target regions (merged and sorted); report mean,\n"
+        "min and fraction of bases >= --min_coverage per target, reading\n"
+        "only the alignments overlapping the targets",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default="numpy",
+        help="Depth engine: numpy (read start/end events, vectorized)\n"
+        "or pysamstats (per-base records) (default: numpy)",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of worker processes, each with its own BAM handle (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Split chromosomes into sub-regions of this size (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep per-chromosome depth arrays as .npy files next to the BAM\n"
+        "([BAM].depth_cache, keyed by BAM size and mtime); later runs with\n"
+        "other thresholds or bins read them instead of the alignments",
+    )
     args = parser.parse_args()
+    matrix_mode = len(args.sam) > 1
+    if len(args.min_coverage) > 1 and not args.output and not matrix_mode and not args.regions:
+        parser.error("--output is required with several --min_coverage thresholds")
+    if args.regions and args.bin_size is not None:
+        parser.error("--bin-size cannot be combined with --regions")
+    if args.bin_size is not None:
+        if args.bin_size < 1:
+            parser.error("--bin-size must be a positive integer")
+        if not args.bin_output and not matrix_mode:
+            parser.error("--bin-output is required with --bin-size")
+        # Sub-regions start on window boundaries, so no window is split
+        args.chunk_size = -(-args.chunk_size // args.bin_size) * args.bin_size
 
     try:
         # Setup output handler
         output_file = args.output
-        fh = open(output_file, "w") if output_file else sys.stdout
-        fh.write("chr\tstart\tend\tmean_cov\n")
+        per_threshold = len(args.min_coverage) > 1 and not matrix_mode and not args.regions
+        fh = open(output_file, "w") if output_file and not per_threshold else sys.stdout
+
+        if matrix_mode:
+            references = None
+            for path in args.sam:
+                with pysam.AlignmentFile(path, "rb") as bam:
+                    if not bam.references:
+                        raise ValueError(f"BAM file lacks reference sequences: {path}")
+                    if references is None:
+                        references = list(zip(bam.references, bam.lengths))
+                        if args.regions:
+                            windows = read_targets(args.regions, bam)
+                        else:
+                            windows = matrix_windows(bam, args.bin_size)
+                    elif list(zip(bam.references, bam.lengths)) != references:
+                        raise ValueError(f"BAM file has different reference sequences: {path}")
+
+            caches = None
+            if args.cache:
+                caches = [DepthCache(path, args.engine) for path in args.sam]
+                for cache in caches:
+                    with pysam.AlignmentFile(cache.bam_path, "rb") as bam:
+                        cache.prepare(bam, allocate=not args.regions)
+                if args.regions:
+                    # Targets cover part of the genome only: use complete caches, never build one
+                    caches = [cache if cache.ready else None for cache in caches]
+
+            matrix = coverage_matrix(
+                args.sam, windows, args.engine, args.bin_size, args.chunk_size, args.threads,
+                caches, targeted=bool(args.regions),
+            )
+            for cache in caches or []:
+                if cache is not None:
+                    cache.finish()
+            write_coverage_matrix(fh, windows, [sample_name(path) for path in args.sam], matrix)
+            if output_file:
+                fh.close()
+            return
+
+        bam_path = args.sam[0]
 
-        with pysam.AlignmentFile(args.sam, "rb") as bam:
+        if args.regions:
+            with pysam.AlignmentFile(bam_path, "rb") as bam:
+                if not bam.references:
+                    raise ValueError("BAM file lacks reference sequences")
+                targets = read_targets(args.regions, bam)
+                cache = None
+                if args.cache:
+                    cache = DepthCache(bam_path, args.engine)
+                    cache.prepare(bam, allocate=False)
+                    cache = cache if cache.ready else None
+
+            fractions = "\t".join(f"frac_ge_{threshold}" for threshold in args.min_coverage)
+            fh.write(f"chr\tstart\tend\tmean_cov\tmin_cov\t{fractions}\n")
+            tasks = [
+                (chrom, intervals, args.engine, args.min_coverage, args.chunk_size, cache)
+                for chrom, intervals in batch_targets(targets, args.chunk_size)
+            ]
+            for chrom, stats in iter_region_results(bam_path, tasks, batch_target_stats, args.threads):
+                for start, end, total, minimum, covered in stats:
+                    length = end - start
+                    fractions = "\t".join(f"{count / length:.4f}" for count in covered)
+                    fh.write(f"{chrom}\t{start}\t{end}\t{total / length:.2f}\t{minimum}\t{fractions}\n")
+            if output_file:
+                fh.close()
+            return
+
+        if per_threshold:
+            run_fhs = [
+                open(threshold_output_path(output_file, threshold), "w")
+                for threshold in args.min_coverage
+            ]
+        else:
+            run_fhs = [fh]
+        for run_fh in run_fhs:
+            run_fh.write("chr\tstart\tend\tmean_cov\n")
+
+        with pysam.AlignmentFile(bam_path, "rb") as bam:
             if not bam.references:
                 raise ValueError("BAM file lacks reference sequences")
+            regions = split_regions(bam, args.chunk_size)
+            cache = None
+            if args.cache:
+                cache = DepthCache(bam_path, args.engine)
+                cache.prepare(bam)
+
+        bin_fh = None
+        if args.bin_size:
+            bin_fh = open(args.bin_output, "w")
+            bin_fh.write("chr\tstart\tend\tmean_cov\n")
+
+        def write_runs(run_fh, runs):
+            for chrom, start, end, total in runs:
+                run_fh.write(f"{chrom}\t{start}\t{end}\t{total / (end - start):.2f}\n")
+
+        # Process sub-regions (in parallel), merged back in reference order
+        tasks = [
+            (chrom, start, end, args.engine, args.min_coverage, args.bin_size, cache)
+            for chrom, start, end in regions
+        ]
+        mergers = [RunMerger() for _ in run_fhs]
+        for chrom, runs, bins in iter_region_results(bam_path, tasks, region_coverage, args.threads):
+            if bins is not None:
+                for start, end, mean in zip(*(column.tolist() for column in bins)):
+                    bin_fh.write(f"{chrom}\t{start}\t{end}\t{mean:.2f}\n")
+            for run_fh, merger, (starts, ends, sums) in zip(run_fhs, mergers, runs):
+                write_runs(run_fh, merger.add(chrom, starts, ends, sums))
+        for run_fh, merger in zip(run_fhs, mergers):
+            write_runs(run_fh, merger.flush())
+        if cache is not None:
+            cache.finish()
 
-            # Process each chromosome
-            for chrom in bam.references:
-                chrom_len = bam.get_reference_length(chrom)
-                current_start = None
-                current_sum = 0
-                current_count = 0
-
-                # Generate coverage statistics
-                for record in pysamstats.stat_coverage(
-                    bam, chrom=chrom, start=1, end=chrom_len, pad=True
-                ):
-                    pos = record["pos"]
-                    cov = record["reads_all"]
-
-                    if cov >= args.min_coverage:
-                        if current_start is None:
-                            current_start = pos
-                        current_sum += cov
-                        current_count += 1
-                    else:
-                        if current_start is not None:
-                            end = pos - 1
-                            mean_cov = current_sum / current_count
-                            fh.write(
-                                f"{chrom}\t{current_start}\t{end}\t{mean_cov:.2f}\n"
-                            )
-                            current_start = None
-                            current_sum = 0
-                            current_count = 0
-
-                # Handle remaining region at chromosome end
-                if current_start is not None:
-                    end = chrom_len
-                    mean_cov = current_sum / current_count
-                    fh.write(f"{chrom}\t{current_start}\t{end}\t{mean_cov:.2f}\n")
-
-        # Close file handle if output to file
+        # Close file handles if output to file
         if output_file:
-            fh.close()
+            for run_fh in run_fhs:
+                run_fh.close()
+        if bin_fh is not None:
+            bin_fh.close()
 
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
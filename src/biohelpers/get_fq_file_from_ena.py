@@ -1,15 +1,39 @@
 import os
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Union
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Union
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from biohelpers.get_fq_meta_from_ena import fetch_tsv  # Metadata fetching function
 import argparse
 from typing import Tuple
 
+# Seconds between progress reports of running downloads
+PROGRESS_INTERVAL = 30
+# Write buffer size of the python download engine
+CHUNK_SIZE = 8 * 1024 * 1024
+# Network read size, at most this much is fetched again after an interruption
+READ_SIZE = 1024 * 1024
+# Attempts per file before the python engine gives up (also used for corrupt files)
+MAX_ATTEMPTS = 3
+# Verification cache of sync mode, kept in the output directory
+SYNC_MANIFEST = '.sync_manifest.json'
 
-def parse_args() -> Tuple[str, str, str, str, str]:
+
+class FastqEntry(NamedTuple):
+    """One FASTQ file listed in the ENA metadata"""
+    link: str
+    size: int
+    md5: str
+
+
+def parse_args() -> Tuple[str, str, str, str, str, int, str]:
     parser = argparse.ArgumentParser(
     description='Download FASTQ files from ENA',
     add_help=True,
@@ -21,12 +45,21 @@ def parse_args() -> Tuple[str, str, str, str, str]:
                       help='Download protocol type\nftp: Standard FTP download\naspera: High-speed transfer protocol (requires private key)')
     parser.add_argument('--key', '-k',
                     help='Path to aspera private key\nRequired when using aspera protocol\nDefault location: ~/.aspera/connect/etc/asperaweb_id_dsa.openssh')
-    parser.add_argument('--method', '-m', choices=['run', 'save'], default='save',
-                     help='Execution mode\nrun: Execute download commands directly\nsave: Generate download script (default)')
+    parser.add_argument('--method', '-m', choices=['run', 'save', 'sync'], default='save',
+                     help='Execution mode\nrun: Execute download commands directly\nsave: Generate download script (default)\nsync: Download only files missing locally or not matching fastq_bytes/fastq_md5')
     parser.add_argument('--output', '-o',
                     help='Output directory\nDefault format: [accession].fastq.download\nAuto-create missing directories')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                    help='Number of concurrent downloads in run mode\nLargest files are started first')
+    parser.add_argument('--engine', '-e', choices=['wget', 'python'], default='wget',
+                    help='Download engine for ftp links in run mode\nwget: wget -c\npython: built-in HTTPS downloader with resume and MD5 check')
     args = parser.parse_args()
 
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.engine == 'python' and (args.type != 'ftp' or args.method == 'save'):
+        parser.error('--engine python requires --type ftp and --method run or sync')
+
     if args.type == 'aspera':
         if not args.key:
             parser.error('--key is required when using aspera protocol')
@@ -37,7 +70,7 @@ def parse_args() -> Tuple[str, str, str, str, str]:
             parser.error(f'Key file permissions are insecure (current: {oct(key_file.stat().st_mode & 0o777)}).\nRun: chmod 600 "{key_file}" to fix')
 
     output_dir = args.output or f"{args.accession}.fastq.download"
-    return args.accession, args.type, args.key, output_dir, args.method
+    return args.accession, args.type, args.key, output_dir, args.method, args.jobs, args.engine
 
 def build_download_command(link: str, protocol: str, output_dir: str, key_path: str = None) -> str:
     if protocol == 'ftp':
@@ -45,28 +78,259 @@ def build_download_command(link: str, protocol: str, output_dir: str, key_path:
     elif protocol == 'aspera' and key_path:
         return f'ascp -v -k 1 -T -l 1000m -P 33001 -i {key_path} era-fasp@{link} {output_dir}/'
 
-def process_metadata(accession: str, protocol: str) -> List[str]:
+def read_fastq_entries(accession: str, protocol: str) -> List[FastqEntry]:
+    """FASTQ links with their `fastq_bytes` and `fastq_md5` from the metadata file"""
     meta_file = f'.{accession}.meta.txt'
     
     try:
         with open(meta_file, 'r') as f:
-            header = f.readline().strip().split('\t')
+            header = f.readline().rstrip('\n').split('\t')
             column_index = header.index('fastq_aspera' if protocol == 'aspera' else 'fastq_ftp')
-            
-            return [
-    link.strip()
-    for line in f
-    if line.strip()
-    for link in line.strip().split('\t')[column_index].split(';')
-    if link.strip()
-]
+            bytes_index = header.index('fastq_bytes') if 'fastq_bytes' in header else None
+            md5_index = header.index('fastq_md5') if 'fastq_md5' in header else None
+
+            entries = []
+            for line in f:
+                if not line.strip():
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                links = fields[column_index].split(';')
+                sizes = fields[bytes_index].split(';') if bytes_index is not None else []
+                md5s = fields[md5_index].split(';') if md5_index is not None else []
+                for i, link in enumerate(links):
+                    if not link.strip():
+                        continue
+                    size = sizes[i].strip() if i < len(sizes) else ''
+                    md5 = md5s[i].strip() if i < len(md5s) else ''
+                    entries.append(FastqEntry(link.strip(), int(size) if size.isdigit() else 0, md5))
+            return entries
     except FileNotFoundError:
         print(f'Metadata file {meta_file} not found')
         return []
 
+def process_metadata(accession: str, protocol: str) -> List[str]:
+    return [entry.link for entry in read_fastq_entries(accession, protocol)]
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+def local_path(entry: FastqEntry, output_dir: str) -> Path:
+    return Path(output_dir) / entry.link.rsplit('/', 1)[-1]
+
+def https_url(link: str) -> str:
+    """ENA serves the fastq_ftp paths over HTTPS as well"""
+    if link.startswith(('http://', 'https://')):
+        return link
+    return 'https://' + link.split('://', 1)[-1]
+
+def download_file(entry: FastqEntry, output_dir: str, chunk_size: int = CHUNK_SIZE,
+                  max_attempts: int = MAX_ATTEMPTS) -> str:
+    """Download one file over HTTPS and return its MD5
+
+    Data is streamed to `<name>.part` in large chunks while the MD5 is
+    updated, so no second read is needed to verify it. An interrupted
+    transfer resumes with a Range request; a file whose size or MD5 does not
+    match `fastq_bytes`/`fastq_md5` is discarded and downloaded again. An
+    existing file of the expected size is kept only if its MD5 matches too
+    (when `fastq_md5` is known).
+    """
+    path = local_path(entry, output_dir)
+    part = path.with_name(path.name + '.part')
+    if path.exists():
+        if not entry.size or path.stat().st_size == entry.size:
+            if not entry.md5:
+                return ''  # Already complete, like wget -c
+            existing_md5 = file_md5(path)
+            if existing_md5 == entry.md5:
+                return existing_md5
+            print(f'\033[33m{path.name}: existing file fails the MD5 check, downloading again\033[0m')
+            path.unlink()
+        else:
+            os.replace(path, part)  # Resume a partial file left by wget -c
+
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5)))
+    for attempt in range(1, max_attempts + 1):
+        md5 = hashlib.md5()
+        offset = part.stat().st_size if part.exists() else 0
+        if offset:
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(chunk_size), b''):
+                    md5.update(block)
+
+        try:
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            with session.get(https_url(entry.link), headers=headers, stream=True, timeout=60) as response:
+                if not (offset and response.status_code == 416):  # 416: nothing left to fetch
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:  # Range ignored, start over
+                        md5 = hashlib.md5()
+                        offset = 0
+                    with open(part, 'ab' if offset else 'wb', buffering=chunk_size) as f:
+                        for chunk in response.iter_content(READ_SIZE):
+                            f.write(chunk)
+                            md5.update(chunk)
+        except requests.exceptions.RequestException as e:
+            print(f'\033[33m{path.name}: attempt {attempt}/{max_attempts} interrupted: {e}\033[0m')
+            continue
+
+        size = part.stat().st_size
+        if entry.size and size != entry.size:
+            print(f'\033[33m{path.name}: attempt {attempt}/{max_attempts} got {size} bytes, expected {entry.size}\033[0m')
+            if size > entry.size:
+                part.unlink()
+            continue
+        if entry.md5 and md5.hexdigest() != entry.md5:
+            print(f'\033[33m{path.name}: attempt {attempt}/{max_attempts} MD5 mismatch, downloading again\033[0m')
+            part.unlink()
+            continue
+        os.replace(part, path)
+        return md5.hexdigest()
+
+    raise RuntimeError(f'{path.name}: failed after {max_attempts} attempts')
+
+def run_download_command(command: str, quiet: bool) -> int:
+    output = subprocess.DEVNULL if quiet else None
+    return subprocess.run(command, shell=True, stdout=output, stderr=output).returncode
+
+def python_download(entry: FastqEntry, output_dir: str, manifest: dict = None) -> int:
+    try:
+        md5 = download_file(entry, output_dir)
+        if manifest is not None and md5:
+            record_md5(manifest, local_path(entry, output_dir), md5)
+        return 0
+    except (RuntimeError, OSError) as e:
+        print(f'\033[31mError downloading: {e}\033[0m')
+        return 1
+
+def file_md5(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def load_manifest(output_dir: str) -> dict:
+    """MD5s of local files keyed by name, with the size and mtime they were computed for"""
+    try:
+        with open(Path(output_dir) / SYNC_MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(output_dir: str, manifest: dict):
+    path = Path(output_dir) / SYNC_MANIFEST
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def record_md5(manifest: dict, path: Path, md5: str):
+    st = path.stat()
+    manifest[path.name] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'md5': md5}
+
+def is_synced(entry: FastqEntry, output_dir: str, manifest: dict) -> bool:
+    """Whether the local copy matches `fastq_bytes` and `fastq_md5`
+
+    The MD5 is only computed when the manifest has no value for the file's
+    current size and mtime, so unchanged files are never read again.
+    """
+    path = local_path(entry, output_dir)
+    if not path.exists():
+        return False
+    st = path.stat()
+    if entry.size and st.st_size != entry.size:
+        return False
+    if not entry.md5:
+        return True
+    cached = manifest.get(path.name)
+    if not (cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns):
+        record_md5(manifest, path, file_md5(path))
+    return manifest[path.name]['md5'] == entry.md5
+
+def select_sync_entries(entries: List[FastqEntry], output_dir: str, manifest: dict) -> List[int]:
+    """Indices of entries to download; changed local files are removed first
+
+    A local file shorter than `fastq_bytes` is kept so the download resumes it.
+    """
+    todo = []
+    for i, entry in enumerate(entries):
+        if is_synced(entry, output_dir, manifest):
+            continue
+        path = local_path(entry, output_dir)
+        if path.exists() and not (entry.size and path.stat().st_size < entry.size):
+            path.unlink()
+        manifest.pop(path.name, None)
+        todo.append(i)
+    return todo
+
+def download_entries(entries: List[FastqEntry], fetch: Callable[[int], int], output_dir: str, jobs: int) -> int:
+    """Download entries with at most `jobs` at a time, largest files first
+
+    `fetch(i)` downloads entries[i] and returns an exit code. Running downloads
+    are reported every PROGRESS_INTERVAL seconds from the size of the file on
+    disk, finished ones with their throughput.
+    Returns the number of failed downloads.
+    """
+    order = sorted(range(len(entries)), key=lambda i: entries[i].size, reverse=True)
+    active = {}
+    lock = threading.Lock()
+    finished = threading.Event()
+
+    def download(i: int) -> Tuple[int, float]:
+        start = time.time()
+        with lock:
+            active[i] = start
+        try:
+            return fetch(i), time.time() - start
+        finally:
+            with lock:
+                del active[i]
+
+    def report_progress():
+        while not finished.wait(PROGRESS_INTERVAL):
+            with lock:
+                running = sorted(active.items())
+            for i, start in running:
+                entry = entries[i]
+                path = local_path(entry, output_dir)
+                part = path.with_name(path.name + '.part')
+                current = next((p.stat().st_size for p in (part, path) if p.exists()), 0)
+                percent = f' ({current / entry.size:.0%})' if entry.size else ''
+                rate = current / max(time.time() - start, 1e-9) / 1024 ** 2
+                print(f'  {path.name}: {format_size(current)}/{format_size(entry.size)}{percent}, {rate:.1f} MB/s')
+
+    monitor = threading.Thread(target=report_progress, daemon=True)
+    monitor.start()
+    start = time.time()
+    failed = 0
+    downloaded = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(download, i): i for i in order}
+        for n, future in enumerate(as_completed(futures), 1):
+            entry = entries[futures[future]]
+            name = local_path(entry, output_dir).name
+            code, elapsed = future.result()
+            if code:
+                failed += 1
+                print(f'\033[31m[{n}/{len(entries)}] Error downloading {name} (exit code {code})\033[0m')
+            else:
+                downloaded += entry.size
+                rate = entry.size / max(elapsed, 1e-9) / 1024 ** 2
+                print(f'[{n}/{len(entries)}] {name} {format_size(entry.size)} in {elapsed:.0f}s ({rate:.1f} MB/s)')
+    finished.set()
+
+    elapsed = time.time() - start
+    print(f'Downloaded {format_size(downloaded)} in {elapsed:.0f}s ({downloaded / max(elapsed, 1e-9) / 1024 ** 2:.1f} MB/s)')
+    return failed
+
 
 def main():
-    accession, protocol, key_path, output_dir, method = parse_args()
+    accession, protocol, key_path, output_dir, method, jobs, engine = parse_args()
     
     # Create output directory
     Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -75,12 +339,12 @@ def main():
     fetch_tsv(accession, output_path=f'.{accession}.meta.txt')
     
     # Process metadata
-    download_links = process_metadata(accession, protocol)
+    entries = read_fastq_entries(accession, protocol)
     
     # Build download commands
     commands = [
-        build_download_command(link, protocol, output_dir, key_path)
-        for link in download_links
+        build_download_command(entry.link, protocol, output_dir, key_path)
+        for entry in entries
     ]
 
     if method == 'save':
@@ -101,14 +365,32 @@ def main():
         print(f'\n\033[32mDownload script generated: {script_path.resolve()}\033[0m')
         print('Please run the next command to download the FASTQ data:\n' + ' '.join(['bash', str(script_path)]))
     else:
-        # Execute commands sequentially
-        print(f'\n\033[33mStarting direct download with {len(commands)} files\033[0m')
-        for i, cmd in enumerate(filter(None, commands), 1):
-            print(f'Downloading file {i}/{len(commands)}')
-            try:
-                os.system(cmd)
-            except Exception as e:
-                print(f'\033[31mError downloading: {e}\033[0m')
+        manifest = None
+        todo = list(range(len(entries)))
+        if method == 'sync':
+            # Only fetch files that are missing or differ from the metadata
+            manifest = load_manifest(output_dir)
+            todo = select_sync_entries(entries, output_dir, manifest)
+            save_manifest(output_dir, manifest)
+            print(f'\n\033[32m{len(entries) - len(todo)} of {len(entries)} files are up to date\033[0m')
+            if not todo:
+                return
+
+        # Execute commands concurrently, largest files first
+        print(f'\n\033[33mStarting direct download with {len(todo)} files, {jobs} at a time\033[0m')
+        if engine == 'python':
+            fetch = lambda i: python_download(entries[todo[i]], output_dir, manifest)
+        else:
+            quiet = jobs > 1  # Interleaved wget/ascp progress bars are unreadable
+            fetch = lambda i: run_download_command(commands[todo[i]], quiet)
+        failed = download_entries([entries[i] for i in todo], fetch, output_dir, jobs)
+
+        if method == 'sync':
+            # Downloads by the python engine are already in the manifest
+            failed = sum(not is_synced(entries[i], output_dir, manifest) for i in todo)
+            save_manifest(output_dir, manifest)
+        if failed:
+            print(f'\033[31m{failed} of {len(todo)} downloads failed\033[0m')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,58 +1,724 @@
 import argparse
+import contextlib
+import csv
+import gzip
+import heapq
+import io
+import json
+import mmap
+import os
+import queue
 import sys
-from collections import defaultdict
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+
+HEADER = "qseqid\tsseqid\tpident\tlength\tmismatch\tgapopen\tqstart\tqend\tsstart\tsend\tevalue\tbitscore\n"
+RBH_HEADER = "query\tsubject\tpident_ab\tevalue_ab\tbitscore_ab\tpident_ba\tevalue_ba\tbitscore_ba\n"
+PANDAS_CHUNKSIZE = 2_000_000
+CACHE_VERSION = 1
+CACHE_DTYPE = [('query', '<i4'), ('pident', '<f4'), ('bitscore', '<f4'), ('evalue', '<f8'),
+               ('offset', '<i8'), ('length', '<i4')]
+
+
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+class BackgroundReader(io.RawIOBase):
+    """Read a binary stream in a background thread, handing blocks over through a bounded queue
+
+    Used to run gzip/zstd decompression (which releases the GIL) concurrently
+    with the filtering loop.
+    """
+
+    def __init__(self, raw, block_size=1 << 22, depth=4):
+        super().__init__()
+        self._raw = raw
+        self._block_size = block_size
+        self._queue = queue.Queue(depth)
+        self._buffer = memoryview(b'')
+        self._error = None
+        self._eof = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        try:
+            while True:
+                block = self._raw.read(self._block_size)
+                self._queue.put(block)
+                if not block:
+                    break
+        except Exception as e:
+            self._error = e
+            self._queue.put(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self._buffer:
+            if self._eof:
+                return 0
+            self._buffer = memoryview(self._queue.get())
+            if not self._buffer:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading or writing .zst files requires the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+def is_plain_file(path):
+    """True for a regular uncompressed file, which supports seeking and byte offsets"""
+    return path != '-' and not path.endswith(COMPRESSED_SUFFIXES)
+
+
+def open_input(path):
+    """Open a BLAST table for reading: '-' is stdin, .gz/.zst are decompressed in a background thread"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    if path.endswith('.gz'):
+        raw = gzip.open(path, 'rb')
+    elif path.endswith('.zst'):
+        raw = _import_zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    else:
+        return open(path, 'r')
+    return io.TextIOWrapper(io.BufferedReader(BackgroundReader(raw)))
+
+
+def open_output(path):
+    """Open the output for writing: '-' is stdout, .gz/.zst are compressed"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', compresslevel=6)
+    if path.endswith('.zst'):
+        writer = _import_zstandard().ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer)
+    return open(path, 'w')
+
+
+def parse_hit(line, evalue_cutoff, max_evalue=False):
+    """Parse one tabular BLAST line, return (qseqid, pident, bitscore) or None if filtered
+
+    By default hits with an E-value below the cutoff are dropped (the historical
+    behaviour of the top-hit filter); with `max_evalue=True` the cutoff is an
+    upper bound and hits with an E-value above it are dropped instead.
+    """
+    if line.startswith('#'):
+        return None
+
+    fields = line.strip().split('\t')
+    if len(fields) < 12:
+        return None
+
+    evalue = float(fields[10])
+    if max_evalue:
+        if evalue > evalue_cutoff:
+            return None
+    elif evalue < evalue_cutoff:
+        return None
+
+    return fields[0], float(fields[2]), float(fields[11])
+
+
+class TopHits:
+    """Bounded min-heap keeping the best `number` hits of one query by (pident, bitscore)
+
+    Ties are broken by input order, so the result matches a stable sort of all hits.
+    """
+
+    __slots__ = ('number', 'heap')
+
+    def __init__(self, number):
+        self.number = number
+        self.heap = []
+
+    def push(self, pident, bitscore, seq, line):
+        # Negated sequence number: among equal scores the earliest line is the largest key
+        item = (pident, bitscore, -seq, line)
+        if len(self.heap) < self.number:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def records(self):
+        """Return (pident, bitscore, seq, line) tuples, best first"""
+        return [(p, b, -s, line) for p, b, s, line in sorted(self.heap, reverse=True)]
+
+
+def iter_top_hits(lines, evalue_cutoff, number, grouped=False, max_evalue=False):
+    """Yield (qseqid, records) in order of first passing hit, records best first
+
+    With `grouped=True` the input must be sorted/grouped by qseqid (as BLAST
+    outfmt 6 output is): each query is flushed as soon as its qseqid changes,
+    so memory stays constant regardless of input size. Otherwise one bounded
+    heap per query is kept until the end of the input. `max_evalue` is passed
+    to parse_hit.
+    """
+    if number < 1:
+        return
+
+    seq = count()
+    if grouped:
+        current_id = None
+        current = None
+        for line in lines:
+            hit = parse_hit(line, evalue_cutoff, max_evalue)
+            if hit is None:
+                continue
+            gene_id, pident, bitscore = hit
+            if gene_id != current_id:
+                if current is not None:
+                    yield current_id, current.records()
+                current_id = gene_id
+                current = TopHits(number)
+            current.push(pident, bitscore, next(seq), line)
+        if current is not None:
+            yield current_id, current.records()
+    else:
+        best_hits = {}
+        for line in lines:
+            hit = parse_hit(line, evalue_cutoff, max_evalue)
+            if hit is None:
+                continue
+            gene_id, pident, bitscore = hit
+            top = best_hits.get(gene_id)
+            if top is None:
+                top = best_hits[gene_id] = TopHits(number)
+            top.push(pident, bitscore, next(seq), line)
+        for gene_id, top in best_hits.items():
+            yield gene_id, top.records()
+
+
+def best_hit_index(lines, evalue_cutoff, grouped=False):
+    """Stream a table into {qseqid: (sseqid, pident, evalue, bitscore)} of each query's best hit
+
+    Hits with an E-value above `evalue_cutoff` are not considered.
+    """
+    index = {}
+    for gene_id, records in iter_top_hits(lines, evalue_cutoff, 1, grouped=grouped, max_evalue=True):
+        fields = records[0][3].rstrip('\r\n').split('\t')
+        index[gene_id] = (fields[1], fields[2], fields[10], fields[11])
+    return index
+
+
+def iter_reciprocal_best_hits(index, lines, evalue_cutoff, grouped=False):
+    """Stream the reverse (B->A) table against a best_hit_index of the forward (A->B) table
+
+    Yield (query_a, subject_b, forward_stats, reverse_stats) for reciprocal pairs,
+    stats being (pident, evalue, bitscore). Hits with an E-value above
+    `evalue_cutoff` are not considered, in either direction. Memory is bounded
+    by the number of queries, not the number of hits.
+    """
+    for gene_b, records in iter_top_hits(lines, evalue_cutoff, 1, grouped=grouped, max_evalue=True):
+        fields = records[0][3].rstrip('\r\n').split('\t')
+        gene_a = fields[1]
+        forward = index.get(gene_a)
+        if forward is not None and forward[0] == gene_b:
+            yield gene_a, gene_b, forward[1:], (fields[2], fields[10], fields[11])
+
+
+def find_chunk_bounds(path, n_chunks):
+    """Split a file into byte ranges whose boundaries fall between two different qseqids
+
+    A boundary is always placed right before a data line whose qseqid differs
+    from the previous data line, so each query lies in exactly one range.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, n_chunks):
+            pos = size * i // n_chunks
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()  # Skip the partial line, it belongs to the previous range
+
+            # Move forward until the qseqid changes; comment and blank lines
+            # can sit inside a query's block, so only data lines are compared
+            first_id = None
+            while True:
+                line_start = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip(b'\r\n') or line.startswith(b'#'):
+                    continue
+                gene_id = line.split(b'\t', 1)[0]
+                if first_id is None:
+                    first_id = gene_id
+                elif gene_id != first_id:
+                    break
+
+            if bounds[-1] < line_start < size:
+                bounds.append(line_start)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_chunk_lines(path, start, end):
+    """Yield decoded lines of the byte range [start, end) of a file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if pos >= end:
+                break
+            pos += len(raw)
+            if raw.endswith(b'\r\n'):
+                raw = raw[:-2] + b'\n'
+            yield raw.decode()
+
+
+def _process_chunk(task):
+    """Worker: filter one byte range and return its per-query top hits"""
+    path, start, end, evalue_cutoff, number, grouped = task
+    lines = iter_chunk_lines(path, start, end)
+    return list(iter_top_hits(lines, evalue_cutoff, number, grouped=grouped))
+
+
+def iter_top_hits_parallel(path, evalue_cutoff, number, workers, grouped=False):
+    """Parallel version of iter_top_hits over a plain file, with identical output
+
+    The file is split into byte ranges aligned to qseqid boundaries and every
+    range is filtered in a process pool. Per-query results are merged in input
+    order, ties are broken by (range, line) so the ranking matches the serial path.
+    """
+    chunks = find_chunk_bounds(path, workers * 4)
+    tasks = [(path, start, end, evalue_cutoff, number, grouped) for start, end in chunks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_results = executor.map(_process_chunk, tasks)
+
+        if grouped:
+            # Ranges are aligned to qseqid changes, each query lives in one range
+            for results in chunk_results:
+                yield from results
+            return
+
+        merged = {}
+        for chunk_index, results in enumerate(chunk_results):
+            for gene_id, records in results:
+                merged.setdefault(gene_id, []).extend(
+                    (p, b, (chunk_index, seq), line) for p, b, seq, line in records
+                )
+
+    for gene_id, records in merged.items():
+        records.sort(key=lambda x: (-x[0], -x[1], x[2]))
+        yield gene_id, records[:number]
+
+
+def _rank_top_frame(df, number):
+    """Keep the best `number` rows of each query, queries ordered by first passing row
+
+    Ranked with NumPy on integer query codes: one lexsort instead of a
+    groupby transform plus a multi-column pandas sort.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes = pd.factorize(df['qseqid'])[0]
+    group_first = np.full(codes.max() + 1, np.iinfo(np.int64).max)
+    np.minimum.at(group_first, codes, df['_first'].to_numpy())
+    # A row belongs to one query only, so each query's rows end up contiguous
+    order = np.lexsort((
+        df['_row'].to_numpy(),
+        -df['bitscore'].to_numpy(),
+        -df['pident'].to_numpy(),
+        group_first[codes],
+    ))
+    sorted_codes = codes[order]
+    position = np.arange(len(order))
+    starts = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    rank = position - np.maximum.accumulate(np.where(starts, position, 0))
+    return df.iloc[order[rank < number]].assign(_first=group_first[sorted_codes[rank < number]])
+
+
+class _PushbackReader:
+    """Read-only text stream that returns `head` before the rest of `stream`"""
+
+    def __init__(self, head, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size=-1):
+        if self.head:
+            data, self.head = self.head, ''
+            return data
+        return self.stream.read(size)
+
+
+def filter_blast_pandas(path, evalue_cutoff, number, chunksize=PANDAS_CHUNKSIZE):
+    """Vectorized filter of an outfmt 6 table (path or text stream), returns the kept rows as a DataFrame
+
+    Only qseqid (categorical), pident/bitscore (float32) and evalue are parsed,
+    in large typed chunks; the E-value filter and the per-query ranking are done
+    with NumPy on integer query codes instead of per-line float() calls. The
+    per-chunk top hits are buffered and re-ranked with the running top hits
+    whenever the buffer outgrows them, so memory is bounded by the chunk size
+    plus twice queries x `number`. The `_row` column is the data row number
+    (comment and blank lines excluded), used to fetch the original lines.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Columns are taken by position so tables with extra trailing columns
+    # (e.g. outfmt "6 std qlen slen") still parse. No comment= here: pandas
+    # would cut a line at any '#', so '#'-prefixed lines are dropped below,
+    # like write_top_hits_frame does when it numbers the data rows. Leading
+    # comment lines are skipped first, as pandas sizes the table on line one.
+    empty = pd.DataFrame({'qseqid': [], '_row': np.array([], dtype=np.int64)})
+    with contextlib.ExitStack() as stack:
+        f_in = path if hasattr(path, 'read') else stack.enter_context(open_input(path))
+        for line in iter(f_in.readline, ''):
+            if line.strip('\r\n') and not line.startswith('#'):
+                break
+        else:
+            return empty
+
+        reader = pd.read_csv(
+            _PushbackReader(line, f_in),
+            sep='\t',
+            header=None,
+            usecols=[0, 2, 10, 11],
+            dtype={0: 'category'},
+            quoting=csv.QUOTE_NONE,
+            chunksize=chunksize,
+        )
+
+        top = None
+        pending = []
+        pending_rows = 0
+        offset = 0
+        for chunk in reader:
+            # Test the '#' prefix once per distinct qseqid, not once per row
+            codes = chunk[0].cat.codes.to_numpy()
+            comment_codes = np.asarray(chunk[0].cat.categories.str.startswith('#'), dtype=bool)
+            if comment_codes.any():
+                chunk = chunk[~(comment_codes[codes] & (codes >= 0))]
+            chunk = pd.DataFrame({
+                'qseqid': chunk[0],
+                'pident': chunk[2].astype(np.float32),
+                # E-values stay float64: float32 underflows to 0 below ~1e-38
+                'evalue': chunk[10].astype(np.float64),
+                'bitscore': chunk[11].astype(np.float32),
+            })
+            rows = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+
+            keep = ~(chunk['evalue'].to_numpy() < evalue_cutoff) & ~np.isnan(chunk['bitscore'].to_numpy())
+            if not keep.any() or number < 1:
+                continue
+
+            chunk = chunk[keep].assign(_row=rows[keep], _first=rows[keep])
+            chunk_top = _rank_top_frame(chunk, number).astype({'qseqid': str})
+            pending.append(chunk_top)
+            pending_rows += len(chunk_top)
+            # Re-rank once the buffered rows outgrow the ranked ones, so each row
+            # is re-sorted an amortised constant number of times
+            if top is None or pending_rows > len(top):
+                top = _rank_top_frame(pd.concat([top] + pending if top is not None else pending,
+                                                 ignore_index=True), number)
+                pending = []
+                pending_rows = 0
+
+    if top is None:
+        return empty
+    if pending:
+        top = _rank_top_frame(pd.concat([top] + pending, ignore_index=True), number)
+    return top[['qseqid', '_row']]
+
+
+def write_top_hits_frame(df, f_in, f_out, block_size=64 * 1024 * 1024):
+    """Write the original lines of the rows kept by filter_blast_pandas
+
+    The text stream's underlying binary buffer is scanned in large blocks:
+    line boundaries and data rows are located with NumPy, and only the kept
+    lines are decoded. Return (query count, record count).
+    """
+    import numpy as np
+
+    rows = np.sort(df['_row'].to_numpy())
+    raw = f_in.buffer
+    kept_lines = {}
+    row_base = 0
+    tail = b''
+    while len(kept_lines) < len(rows):
+        block = raw.read(block_size)
+        data = tail + block
+        if not block:
+            if not data:
+                break
+            data += b'\n'  # Last line without a newline
+        cut = data.rfind(b'\n') + 1
+        data, tail = data[:cut], data[cut:]
+        if not data:
+            continue
+
+        buf = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(buf == ord('\n'))
+        starts = np.r_[0, ends[:-1] + 1]
+        lengths = ends - starts
+        lengths -= (lengths > 0) & (buf[ends - 1] == ord('\r'))
+        # Same row numbering as the parser: skip blank and comment lines
+        data_lines = np.flatnonzero((lengths > 0) & (buf[starts] != ord('#')))
+
+        lo, hi = np.searchsorted(rows, [row_base, row_base + len(data_lines)])
+        picked = data_lines[rows[lo:hi] - row_base]
+        for row, start, length in zip(rows[lo:hi].tolist(), starts[picked].tolist(), lengths[picked].tolist()):
+            kept_lines[row] = data[start:start + length].decode() + '\n'
+        row_base += len(data_lines)
+
+    f_out.write(HEADER)
+    for row in df['_row'].tolist():
+        f_out.write(kept_lines[row])
+    return df['qseqid'].nunique(), len(df)
+
+
+def _cache_stamp(path):
+    stat = os.stat(path)
+    return {'version': CACHE_VERSION, 'input': os.path.abspath(path),
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def is_cache_valid(path, cache_dir):
+    """Check that a cache directory was built from the current version of `path`"""
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return {key: meta.get(key) for key in ('version', 'size', 'mtime_ns')} == \
+        {key: value for key, value in _cache_stamp(path).items() if key != 'input'}
+
+
+def build_blast_cache(path, cache_dir, batch=1_000_000):
+    """Convert a BLAST table into a binary cache directory for fast re-filtering
+
+    hits.npy holds one record per hit (query index, pident, bitscore, evalue,
+    byte offset and length of the line in the original table), grouped by
+    query in order of first appearance. queries.npy is the qseqid offset index:
+    the hits of query i are rows queries[i]:queries[i + 1]. Only the text of
+    the kept lines is read back from the original table when filtering.
+    """
+    import numpy as np
+
+    os.makedirs(cache_dir, exist_ok=True)
+    raw_path = os.path.join(cache_dir, 'hits.raw')
+    query_ids = {}
+    records = []
+    n_hits = 0
+    with open(path, 'rb') as f_in, open(raw_path, 'wb') as f_raw:
+        offset = 0
+        for line in f_in:
+            length = len(line)
+            fields = line.split(b'\t') if not line.startswith(b'#') else ()
+            if len(fields) >= 12:
+                query = query_ids.setdefault(fields[0], len(query_ids))
+                records.append((query, float(fields[2]), float(fields[11]), float(fields[10]), offset, length))
+                if len(records) >= batch:
+                    np.array(records, dtype=CACHE_DTYPE).tofile(f_raw)
+                    n_hits += len(records)
+                    records = []
+            offset += length
+        np.array(records, dtype=CACHE_DTYPE).tofile(f_raw)
+        n_hits += len(records)
+
+    # Group hits by query, keeping input order within a query
+    raw = np.memmap(raw_path, dtype=CACHE_DTYPE, mode='r', shape=(n_hits,)) if n_hits else \
+        np.zeros(0, dtype=CACHE_DTYPE)
+    order = np.argsort(raw['query'], kind='stable')
+    hits = np.lib.format.open_memmap(os.path.join(cache_dir, 'hits.npy'), mode='w+',
+                                     dtype=CACHE_DTYPE, shape=(n_hits,))
+    for start in range(0, n_hits, batch):
+        hits[start:start + batch] = raw[order[start:start + batch]]
+    hits.flush()
+    queries = np.zeros(len(query_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(hits['query'], minlength=len(query_ids)), out=queries[1:])
+    np.save(os.path.join(cache_dir, 'queries.npy'), queries)
+    del raw, hits
+    os.remove(raw_path)
+
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump(dict(_cache_stamp(path), hits=n_hits, queries=len(query_ids)), f, indent=2)
+    return n_hits, len(query_ids)
+
+
+def filter_blast_cache(cache_dir, evalue_cutoff, number, block=10_000_000):
+    """Filter a cache from build_blast_cache, return (line offsets, line lengths, query count)
+
+    The cache is memory-mapped and processed in blocks of whole queries; the
+    E-value filter and per-query ranking are plain NumPy operations. Offsets are
+    returned in output order (queries by first passing hit, hits best first).
+    """
+    import numpy as np
+
+    hits = np.load(os.path.join(cache_dir, 'hits.npy'), mmap_mode='r')
+    queries = np.load(os.path.join(cache_dir, 'queries.npy'))
+
+    kept = []
+    start_query = 0
+    while start_query < len(queries) - 1 and number >= 1:
+        end_query = max(int(np.searchsorted(queries, queries[start_query] + block, side='right')) - 1,
+                        start_query + 1)
+        part = hits[queries[start_query]:queries[end_query]]
+        start_query = end_query
+
+        part = part[~(part['evalue'] < evalue_cutoff)]
+        if len(part) == 0:
+            continue
+        # Rows are grouped by query in input order: the first row of a group is its first passing hit
+        order = np.lexsort((part['offset'], -part['bitscore'], -part['pident'], part['query']))
+        ranked = part[order]
+        group_starts = np.flatnonzero(np.r_[True, ranked['query'][1:] != ranked['query'][:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(ranked)])
+        rank = np.arange(len(ranked)) - np.repeat(group_starts, group_sizes)
+        first_offset = np.repeat(part['offset'][np.flatnonzero(
+            np.r_[True, part['query'][1:] != part['query'][:-1]])], group_sizes)
+        top = rank < number
+        kept.append((first_offset[top], rank[top], ranked['offset'][top], ranked['length'][top]))
+
+    if not kept:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), 0
+    first_offset, rank, offsets, lengths = (np.concatenate(column) for column in zip(*kept))
+    order = np.lexsort((rank, first_offset))
+    return offsets[order], lengths[order], len(np.unique(first_offset))
+
+
+def write_cached_hits(path, offsets, lengths, f_out):
+    """Write the lines at the given byte offsets of the original table, return record count"""
+    f_out.write(HEADER)
+    if len(offsets) == 0:
+        return 0
+    with open(path, 'rb') as f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset, length in zip(offsets.tolist(), lengths.tolist()):
+            f_out.write(mm[offset:offset + length].decode().rstrip('\r\n') + '\n')
+    return len(offsets)
+
+
+def write_top_hits(results, f_out):
+    """Write (qseqid, records) results, return (query count, record count)"""
+    total_queries = 0
+    total_hits = 0
+    f_out.write(HEADER)
+    for _, records in results:
+        total_queries += 1
+        for record in records:
+            line = record[3]
+            f_out.write(line if line.endswith('\n') else line + '\n')
+            total_hits += 1
+    return total_queries, total_hits
+
 
 def main():
     parser = argparse.ArgumentParser(description='Process BLAST results and filter by E-value')
-    parser.add_argument('-i', '--input', required=True, help='Input BLAST result file')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Input BLAST result file, "-" for stdin (.gz/.zst decompressed on the fly)')
     parser.add_argument('-e', '--evalue', type=float, default=1e-5, help='E-value threshold (default: 1e-5)')
-    parser.add_argument('-o', '--output', required=True, help='Output file path')
+    parser.add_argument('-o', '--output', required=True,
+                        help='Output file path, "-" for stdout (.gz/.zst compressed on the fly)')
     parser.add_argument('-n', '--number', type=int, default=1, help='Number of top hits to retain per query (default: 1)')
-    
+    parser.add_argument('-s', '--stream', action='store_true',
+                        help='Input is grouped by qseqid (default BLAST outfmt 6 order); flush each query '
+                             'as soon as its qseqid changes so memory stays constant')
+    parser.add_argument('-r', '--rbh', metavar='REVERSE',
+                        help='Reverse BLAST table (B->A, .gz/.zst supported); output reciprocal best '
+                             'hit pairs between it and the input table (A->B); hits with an E-value '
+                             'above -e are ignored in both tables')
+    parser.add_argument('-c', '--cache', metavar='DIR',
+                        help='Binary cache directory of the input table; built on first use (or when '
+                             'the input changed), later runs re-filter from it without parsing the text')
+    parser.add_argument('--engine', choices=['python', 'pandas'], default='python',
+                        help='Filtering engine: python (line by line) or pandas (vectorized, '
+                             'large typed chunks) (default: python)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of worker processes; the file is split into byte ranges '
+                             'aligned to query boundaries; python engine only, not with '
+                             '--rbh or --cache (default: 1)')
+
     args = parser.parse_args()
-    
-    # Store best matches for each gene
-    best_hits = defaultdict(list)
-    
+
+    if not is_plain_file(args.input):
+        if args.cache:
+            parser.error('--cache requires a plain (uncompressed) input file')
+        if args.workers > 1:
+            parser.error('--workers requires a plain (uncompressed) input file')
+        if args.engine == 'pandas' and args.input == '-':
+            parser.error('--engine pandas reads the input twice and cannot read from stdin')
+    if args.workers > 1:
+        if args.rbh:
+            parser.error('--workers cannot be combined with --rbh')
+        if args.cache:
+            parser.error('--workers cannot be combined with --cache')
+        if args.engine == 'pandas':
+            parser.error('--workers only applies to --engine python')
+
+    # Keep stdout clean for the results when writing to it
+    log = sys.stderr if args.output == '-' else sys.stdout
+
     try:
-        with open(args.input, 'r') as f_in, open(args.output, 'w') as f_out:
-            for line in f_in:
-                if line.startswith('#'):
-                    continue
-                
-                fields = line.strip().split('\t')
-                if len(fields) < 12:
-                    continue
-                
-                evalue = float(fields[10])
-                if evalue < args.evalue:
-                    continue
-                
-                gene_id = fields[0]
-                pident = float(fields[2])
-                bitscore = float(fields[11])
-                best_hits[gene_id].append((pident, bitscore, line))
-            
-            # Filter highest scoring records for each gene
-            total_hits = 0
-            header = "qseqid\tsseqid\tpident\tlength\tmismatch\tgapopen\tqstart\tqend\tsstart\tsend\tevalue\tbitscore\n"
-            f_out.write(header)
-            for gene, records in best_hits.items():
-                if records:
-                    sorted_records = sorted(records, key=lambda x: (-x[0], -x[1]))
-                    # Validate field index validity
-                    if len(fields) < 12:
-                        print(f"Warning: Line {line.strip()} lacks required fields, skipped")
-                        continue
-                    for record in sorted_records[:args.number]:
-                        f_out.write(record[2])
-                        total_hits += 1
-            
-            print(f"Successfully processed {len(best_hits)} query sequences, retained {total_hits} records.")
-        print(f"Results saved to: {args.output}")
-    
+        if args.rbh:
+            with open_input(args.input) as f_in:
+                index = best_hit_index(f_in, args.evalue, grouped=args.stream)
+            total_pairs = 0
+            with open_input(args.rbh) as f_rev, open_output(args.output) as f_out:
+                f_out.write(RBH_HEADER)
+                for gene_a, gene_b, forward, reverse in iter_reciprocal_best_hits(
+                    index, f_rev, args.evalue, grouped=args.stream
+                ):
+                    f_out.write('\t'.join((gene_a, gene_b) + forward + reverse) + '\n')
+                    total_pairs += 1
+            print(f"Successfully processed {len(index)} query sequences, found {total_pairs} reciprocal best hit pairs.", file=log)
+            print(f"Results saved to: {args.output}", file=log)
+            return
+
+        if args.cache:
+            if not is_cache_valid(args.input, args.cache):
+                print(f"Building binary cache: {args.cache}", file=log)
+                build_blast_cache(args.input, args.cache)
+            offsets, lengths, total_queries = filter_blast_cache(args.cache, args.evalue, args.number)
+            with open_output(args.output) as f_out:
+                total_hits = write_cached_hits(args.input, offsets, lengths, f_out)
+            print(f"Successfully processed {total_queries} query sequences, retained {total_hits} records.", file=log)
+            print(f"Results saved to: {args.output}", file=log)
+            return
+
+        with open_input(args.input) as f_in, open_output(args.output) as f_out:
+            if args.engine == 'pandas':
+                with open_input(args.input) as f_parse:
+                    kept = filter_blast_pandas(f_parse, args.evalue, args.number)
+                total_queries, total_hits = write_top_hits_frame(kept, f_in, f_out)
+            else:
+                if args.workers > 1:
+                    results = iter_top_hits_parallel(args.input, args.evalue, args.number,
+                                                     args.workers, grouped=args.stream)
+                else:
+                    results = iter_top_hits(f_in, args.evalue, args.number, grouped=args.stream)
+                total_queries, total_hits = write_top_hits(results, f_out)
+
+            print(f"Successfully processed {total_queries} query sequences, retained {total_hits} records.", file=log)
+        print(f"Results saved to: {args.output}", file=log)
+
     except Exception as e:
-        print(f"Error processing file: {str(e)}")
+        print(f"Error processing file: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == '__main__':
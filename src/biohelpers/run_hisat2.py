@@ -1,9 +1,29 @@
 import argparse
+import json
 import os
+import re
+import shutil
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# Directory for the per-sample scripts written in save mode
+JOB_DIR = "run_hisat2_jobs"
+
+# Share of the available memory given to samtools sort, the rest is left for hisat2
+SORT_MEMORY_FRACTION = 0.5
+
+# Metrics parsed from the hisat2 alignment summary on stderr
+HISAT2_METRICS = [
+    ('reads', int, re.compile(r'^(\d+) reads; of these:')),
+    ('paired', int, re.compile(r'^(\d+) \([\d.]+%\) were paired')),
+    ('concordant_unique', int, re.compile(r'^(\d+) \([\d.]+%\) aligned concordantly exactly 1 time')),
+    ('concordant_multi', int, re.compile(r'^(\d+) \([\d.]+%\) aligned concordantly >1 times')),
+    ('overall_alignment_rate', float, re.compile(r'^([\d.]+)% overall alignment rate')),
+]
+
 def validate_fastq_files(folder):
     """Validate fastq.gz files in the directory"""
     fastq_files = list({f for f in Path(folder).glob('*.*') 
@@ -17,7 +37,6 @@ def pair_end_files(fastq_files, index):
     """Pair-end sequencing files matching"""
     pairs = {}
     for f in sorted(fastq_files):
-        import re
         base_pattern = re.compile(r'(.+?)_[12](?:\..+)?$')
         base_match = base_pattern.match(f.name.split('.', 1)[0])
         if base_match:
@@ -40,8 +59,249 @@ def pair_end_files(fastq_files, index):
         f"{base}.sorted.bam"
     ) for base, pair in pairs.items()]
 
-def run_hisat2(index, threads, folder, output, method):
-    """Execute HISAT2 alignment workflow"""
+def split_threads(threads, jobs):
+    """Split a total core budget between `jobs` concurrent samples
+
+    Returns (hisat2 threads, samtools sort threads) for a single sample. The
+    aligner is the CPU-bound step and gets about three quarters of the share.
+    """
+    per_job = max(1, threads // jobs)
+    sort_threads = max(1, per_job // 4)
+    hisat2_threads = max(1, per_job - sort_threads)
+    return hisat2_threads, sort_threads
+
+def available_memory():
+    """Available RAM in bytes"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+def auto_sort_mem(jobs, sort_threads):
+    """samtools sort -m value from the available RAM and the concurrency level
+
+    SORT_MEMORY_FRACTION of the available memory is shared by every sort
+    thread of the `jobs` concurrent samples.
+    """
+    per_thread = int(available_memory() * SORT_MEMORY_FRACTION) // (jobs * (sort_threads + 1))
+    return f"{max(per_thread >> 20, 256)}M"
+
+def work_bam_path(bam_path, tmpdir=None):
+    """Temporary BAM path, on local scratch when `tmpdir` is given"""
+    if tmpdir:
+        return Path(tmpdir) / f"{Path(bam_path).name}.tmp"
+    return Path(f"{bam_path}.tmp")
+
+def samtools_sort_cmd(bam_path, sort_threads, tmpdir=None, sort_mem=None):
+    """samtools sort reading SAM from stdin, writing the BAM and its .bai index in one step"""
+    cmd = ['samtools', 'sort', '-@', str(sort_threads)]
+    if sort_mem:
+        cmd += ['-m', sort_mem]
+    if tmpdir:
+        cmd += ['-T', str(Path(tmpdir) / f"{Path(bam_path).name}.sort")]
+    cmd += ['--write-index', '-O', 'BAM', '-o', f"{bam_path}##idx##{bam_path}.bai", '-']
+    return cmd
+
+def build_pipe_cmd(index, r1, r2, bam_path, hisat2_threads, sort_threads, tmpdir=None, sort_mem=None):
+    """hisat2 alignment piped into samtools sort"""
+    sort_cmd = ' '.join(samtools_sort_cmd(bam_path, sort_threads, tmpdir, sort_mem))
+    return f"hisat2 -x {index} -1 {r1} -2 {r2} -p {hisat2_threads} | {sort_cmd}"
+
+def parse_hisat2_line(line, metrics):
+    """Update `metrics` from one line of the hisat2 summary"""
+    line = line.strip()
+    for key, cast, pattern in HISAT2_METRICS:
+        match = pattern.match(line)
+        if match:
+            metrics[key] = cast(match.group(1))
+            return
+
+def run_alignment(index, r1, r2, bam_path, hisat2_threads, sort_threads, metrics_path=None,
+                  tmpdir=None, sort_mem=None):
+    """Run hisat2 | samtools sort with explicit pipes and return the alignment metrics
+
+    hisat2's stderr is echoed line by line as it arrives and parsed into
+    read counts and the overall alignment rate. When `metrics_path` is given
+    the metrics, wall-clock time and reads/sec are written there as JSON,
+    for failed runs too. Raises CalledProcessError if either step fails, or
+    OSError if hisat2 or samtools cannot be started.
+    The sort spills to `tmpdir` with `sort_mem` per thread and writes
+    `<bam_path>.bai` alongside the BAM.
+    """
+    sample = Path(bam_path).name.split('.', 1)[0]
+    hisat2_cmd = ['hisat2', '-x', str(index), '-1', str(r1), '-2', str(r2), '-p', str(hisat2_threads)]
+    sort_cmd = samtools_sort_cmd(bam_path, sort_threads, tmpdir, sort_mem)
+    metrics = {'sample': sample, 'fastq1': str(r1), 'fastq2': str(r2)}
+    stderr_lines = []
+
+    start = time.perf_counter()
+    hisat2 = None
+    try:
+        hisat2 = subprocess.Popen(hisat2_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        sort = subprocess.Popen(sort_cmd, stdin=hisat2.stdout)
+    except OSError:
+        # e.g. hisat2 or samtools not on PATH: stop hisat2 if it already started
+        if hisat2 is not None:
+            hisat2.kill()
+            hisat2.communicate()
+        metrics['seconds'] = round(time.perf_counter() - start, 2)
+        metrics['status'] = 'failed'
+        if metrics_path:
+            with open(metrics_path, 'w') as f:
+                json.dump(metrics, f, indent=2)
+        raise
+    hisat2.stdout.close()  # hisat2 gets SIGPIPE if samtools sort exits early
+    for line in hisat2.stderr:
+        stderr_lines.append(line)
+        print(f"[{sample}] {line}", end='', flush=True)
+        parse_hisat2_line(line, metrics)
+    hisat2_code = hisat2.wait()
+    sort_code = sort.wait()
+    elapsed = time.perf_counter() - start
+
+    metrics['seconds'] = round(elapsed, 2)
+    if 'reads' in metrics and elapsed:
+        metrics['reads_per_second'] = round(metrics['reads'] / elapsed, 1)
+    metrics['status'] = 'failed' if hisat2_code or sort_code else 'done'
+    if metrics_path:
+        with open(metrics_path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+    if sort_code:
+        # A failed sort makes hisat2 die of SIGPIPE, so blame the sort first
+        raise subprocess.CalledProcessError(sort_code, ' '.join(sort_cmd),
+                                            stderr=''.join(stderr_lines))
+    if hisat2_code:
+        raise subprocess.CalledProcessError(hisat2_code, ' '.join(hisat2_cmd),
+                                            stderr=''.join(stderr_lines))
+    return metrics
+
+def file_stamp(paths):
+    """One `path<TAB>size<TAB>mtime` line per file, the same as `stat -c '%n\t%s\t%Y'`"""
+    lines = []
+    for path in paths:
+        st = os.stat(path)
+        lines.append(f"{path}\t{st.st_size}\t{int(st.st_mtime)}\n")
+    return ''.join(lines)
+
+def is_sample_done(r1, r2, bam_path):
+    """A sample is done when its marker matches the current inputs and BAM"""
+    marker = Path(f"{bam_path}.done")
+    if not (marker.exists() and Path(bam_path).exists()):
+        return False
+    return marker.read_text() == file_stamp([r1, r2, bam_path])
+
+def install_bam(work_bam, bam_path):
+    """Move a finished BAM and its .bai into place, index first
+
+    Files coming from another directory (local scratch) are copied next to
+    the destination under a temporary name first, so each rename is atomic.
+    """
+    for src, dst in ((f"{work_bam}.bai", f"{bam_path}.bai"), (str(work_bam), str(bam_path))):
+        if Path(src).parent.resolve() != Path(dst).parent.resolve():
+            shutil.move(src, f"{dst}.tmp")
+            src = f"{dst}.tmp"
+        os.replace(src, dst)
+
+def align_sample(index, r1, r2, bam_path, hisat2_threads, sort_threads, tmpdir=None, sort_mem=None):
+    """Align one sample, return its metrics
+
+    The BAM is written under a temporary name, on `tmpdir` when given, and
+    moved into place with its index once samtools sort succeeds, then a `.done`
+    marker records the input and output sizes and mtimes.
+    Metrics go to a `.metrics.json` sidecar next to the BAM.
+    """
+    work_bam = work_bam_path(bam_path, tmpdir)
+    if tmpdir:
+        os.makedirs(tmpdir, exist_ok=True)
+    Path(f"{bam_path}.done").unlink(missing_ok=True)
+    try:
+        metrics = run_alignment(index, r1, r2, work_bam, hisat2_threads, sort_threads,
+                                metrics_path=f"{bam_path}.metrics.json",
+                                tmpdir=tmpdir, sort_mem=sort_mem)
+    except (subprocess.CalledProcessError, OSError):
+        work_bam.unlink(missing_ok=True)
+        Path(f"{work_bam}.bai").unlink(missing_ok=True)
+        raise
+    install_bam(work_bam, bam_path)
+    Path(f"{bam_path}.done").write_text(file_stamp([r1, r2, bam_path]))
+    return metrics
+
+def print_summary(results):
+    """Per-sample wall-clock, throughput and alignment rate table"""
+    print(f"\n{'Sample':<30}{'Status':<8}{'Time (s)':>10}{'Input (MB)':>12}{'MB/s':>8}"
+          f"{'Reads':>14}{'Reads/s':>10}{'Aligned':>9}")
+    for sample, status, elapsed, input_bytes, metrics in results:
+        input_mb = input_bytes / 1e6
+        rate = f"{input_mb / elapsed:.1f}" if elapsed else '-'
+        reads = metrics.get('reads', '-')
+        reads_rate = metrics.get('reads_per_second', '-')
+        aligned = metrics.get('overall_alignment_rate')
+        aligned = f"{aligned:.2f}%" if aligned is not None else '-'
+        print(f"{sample:<30}{status:<8}{elapsed:>10.1f}{input_mb:>12.1f}{rate:>8}"
+              f"{reads:>14}{reads_rate:>10}{aligned:>9}")
+
+def write_job_scripts(pairs, index, output, jobs, hisat2_threads, sort_threads, tmpdir=None, sort_mem=None):
+    """Write one script per sample, a manifest and a driver running `jobs` of them at a time
+
+    Returns the path of the driver script.
+    """
+    job_dir = Path(JOB_DIR)
+    job_dir.mkdir(exist_ok=True)
+    job_scripts = []
+    for r1, r2, bam_name in pairs:
+        bam_path = Path(output) / bam_name
+        job_path = job_dir / f"{bam_name[:-len('.sorted.bam')]}.sh"
+        stat_cmd = f"stat -c '%n\t%s\t%Y' {r1} {r2} {bam_path}"
+        with open(job_path, 'w') as f:
+            f.write("#!/bin/bash\nset -euo pipefail\n")
+            # Skip the sample when its marker still matches the inputs and BAM
+            f.write(f"if [ -f {bam_path}.done ] && [ -f {bam_path} ] && "
+                    f"[ \"$({stat_cmd})\" = \"$(cat {bam_path}.done)\" ]; then\n"
+                    f"    echo \"Skipping {bam_path}: already aligned\"\n    exit 0\nfi\n")
+            f.write(f"rm -f {bam_path}.done\n")
+            work_bam = work_bam_path(bam_path, tmpdir)
+            if tmpdir:
+                f.write(f"mkdir -p {tmpdir}\n")
+            f.write(build_pipe_cmd(index, r1, r2, work_bam, hisat2_threads, sort_threads,
+                                   tmpdir, sort_mem) + "\n")
+            if tmpdir:
+                # Copy back from local scratch first, then rename in place
+                f.write(f"mv {work_bam}.bai {bam_path}.tmp.bai\nmv {work_bam} {bam_path}.tmp\n")
+                work_bam = f"{bam_path}.tmp"
+            f.write(f"mv {work_bam}.bai {bam_path}.bai\nmv {work_bam} {bam_path}\n")
+            f.write(f"{stat_cmd} > {bam_path}.done\n")
+        os.chmod(job_path, 0o755)
+        job_scripts.append(job_path.resolve())
+
+    manifest_path = job_dir / "manifest.txt"
+    with open(manifest_path, 'w') as f:
+        f.writelines(f"{path}\n" for path in job_scripts)
+
+    script_path = Path("run_hisat2.sh")
+    with open(script_path, 'w') as f:
+        f.write("#!/bin/bash\n")
+        f.write(f"# {len(job_scripts)} samples, {jobs} at a time "
+                f"(hisat2 -p {hisat2_threads}, samtools sort -@ {sort_threads} -m {sort_mem})\n")
+        f.write(f"xargs -P {jobs} -n 1 bash < {manifest_path.resolve()}\n")
+    os.chmod(script_path, 0o755)
+    return script_path
+
+def run_hisat2(index, threads, folder, output, method, jobs=1, tmpdir=None, sort_mem='auto'):
+    """Execute HISAT2 alignment workflow
+
+    In run mode up to `jobs` samples are aligned concurrently, each with an
+    equal share of the `threads` budget split between hisat2 and samtools sort.
+    Save mode writes scripts that run the samples with the same parallelism.
+    Finished samples carry a `.done` marker and are skipped on restart.
+    With `tmpdir` samtools sort spills to local scratch and only the final
+    BAM and its index are copied to `output`; `sort_mem='auto'` sizes the
+    per-thread sort memory from the available RAM.
+    """
     os.makedirs(output, exist_ok=True)
     
     try:
@@ -51,47 +311,76 @@ def run_hisat2(index, threads, folder, output, method):
         print(f"Error: {e}")
         sys.exit(1)
 
-    for r1, r2, bam_name in pairs:
-        sam_path = Path(output) / f"{Path(bam_name).stem}.sam"
-        bam_path = Path(output) / bam_name
-        
-        # 合并hisat2比对和samtools排序
-        pipe_cmd = f"hisat2 -x {index} -1 {r1} -2 {r2} -p {threads} | samtools sort -@ {threads} -O BAM -o {bam_path} -"
-        
-        if method == 'run':
-            try:
-                subprocess.run(pipe_cmd, shell=True, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Command execution failed: {e}")
-                sys.exit(1)
-        # Merge hisat2 alignment and samtools sorting
-        # Bugfix: Original code `elif method == 'save':` had syntax issues, need to add logic block
-        pass  # Placeholder for future logic implementation
-            script_path = Path("run_hisat2.sh")
-            with open(script_path, 'w') as f:
-                pass
-            os.chmod(script_path, 0o755)
+    if method == 'run':
+        todo = []
+        for r1, r2, bam_name in pairs:
+            if is_sample_done(r1, r2, Path(output) / bam_name):
+                print(f"Skipping {bam_name}: already aligned")
+            else:
+                todo.append((r1, r2, bam_name))
+        pairs = todo
+        if not pairs:
+            print("All samples are already aligned")
+            return
+
+    jobs = max(1, min(jobs, len(pairs)))
+    hisat2_threads, sort_threads = split_threads(threads, jobs)
+    if sort_mem == 'auto':
+        sort_mem = auto_sort_mem(jobs, sort_threads)
+
+    if method == 'run':
+        print(f"Aligning {len(pairs)} samples, {jobs} at a time "
+              f"(hisat2 -p {hisat2_threads}, samtools sort -@ {sort_threads} -m {sort_mem})")
+        results = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
             for r1, r2, bam_name in pairs:
-                sam_path = Path(output) / f"{Path(bam_name).stem}.sam"
                 bam_path = Path(output) / bam_name
-                
-                pipe_cmd = f"hisat2 -x {index} -1 {r1} -2 {r2} -p {threads} | samtools sort -@ {threads} -O BAM -o {bam_path} -"
-                
-                with open(script_path, 'a') as f:
-                    f.write(f"{pipe_cmd}\n")
+                future = executor.submit(align_sample, index, r1, r2, bam_path,
+                                         hisat2_threads, sort_threads, tmpdir, sort_mem)
+                futures[future] = (bam_name[:-len('.sorted.bam')], r1, r2)
+
+            for future in as_completed(futures):
+                sample, r1, r2 = futures[future]
+                input_bytes = os.path.getsize(r1) + os.path.getsize(r2)
+                try:
+                    metrics = future.result()
+                    results.append((sample, 'done', metrics['seconds'], input_bytes, metrics))
+                    print(f"Finished {sample} in {metrics['seconds']:.1f}s")
+                except Exception as e:
+                    results.append((sample, 'failed', 0.0, input_bytes, {}))
+                    print(f"Command execution failed: {e}")
+
+        print_summary(results)
+        if any(result[1] == 'failed' for result in results):
+            sys.exit(1)
+
+    elif method == 'save':
+        script_path = write_job_scripts(pairs, index, output, jobs, hisat2_threads, sort_threads,
+                                        tmpdir, sort_mem)
         print(f"\nPlease run the following command to execute the alignment:\nbash {script_path}\n")
+        print(f"Per-sample scripts are listed one per line in {JOB_DIR}/manifest.txt "
+              f"(usable as a job-array manifest)\n")
 
 def main():
     parser = argparse.ArgumentParser(description='HISAT2 RNA-seq alignment pipeline')
     parser.add_argument('-x', '--index', required=True, help='Reference genome index path')
     parser.add_argument('-t', '--threads', type=int, default=os.cpu_count(), 
-                       help='Number of threads (default: all cores)')
+                       help='Total number of threads shared by all concurrent samples (default: all cores)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Number of samples aligned concurrently (default: 1)')
     parser.add_argument('-f', '--folder', required=True, 
                        help='Input directory containing FASTQ files')
     parser.add_argument('-m', '--method', choices=['run', 'save'], default='run',
                        help='Execution method: run immediately or save to script')
     parser.add_argument('-o', '--output', required=True, 
                        help='Output directory for BAM files')
+    parser.add_argument('--tmpdir',
+                       help='Local scratch directory for samtools sort temp files and the BAM '
+                            'being written; only the final BAM and index are copied to the output')
+    parser.add_argument('--sort-mem', default='auto',
+                       help='Memory per samtools sort thread, e.g. 2G '
+                            '(default: auto, from the available RAM and --jobs)')
     
     args = parser.parse_args()
     index_files = list(Path(args.index).parent.glob(f"{Path(args.index).name}*.ht2"))
@@ -100,7 +389,15 @@ def main():
         print(f"Expected files like: {args.index}.1.ht2, {args.index}.2.ht2, etc.")
         sys.exit(1)
     
-    run_hisat2(args.index, args.threads, args.folder, args.output, args.method)
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+    if args.sort_mem != 'auto' and not re.fullmatch(r'\d+[KMG]?', args.sort_mem):
+        print(f"Error: Invalid --sort-mem '{args.sort_mem}', expected a size like 768M or 2G")
+        sys.exit(1)
+    
+    run_hisat2(args.index, args.threads, args.folder, args.output, args.method, args.jobs,
+               args.tmpdir, args.sort_mem)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -14,6 +14,8 @@ from pathlib import Path
 
 import pandas as pd
 
+from biohelpers.run_hisat2 import align_sample, auto_sort_mem
+
 
 def run_command(cmd, description=""):
     """Execute shell command and handle errors"""
@@ -48,18 +50,36 @@ def build_hisat2_index(genome_path, threads):
     return index_prefix
 
 
-def run_hisat2_mapping(index_prefix, fastq1, fastq2, output_bam, threads):
-    """Run HISAT2 alignment and sorting"""
+def run_hisat2_mapping(index_prefix, fastq1, fastq2, output_bam, threads, tmpdir=None, sort_mem=None):
+    """Run HISAT2 alignment and sorting
+
+    hisat2's summary is streamed as it arrives and the parsed metrics are
+    saved to <output_bam>.metrics.json. The sort spills to `tmpdir` when given
+    and writes <output_bam>.bai in the same step; `sort_mem` defaults to a
+    per-thread share of the available RAM.
+    """
     # Ensure output directory exists
     output_dir = os.path.dirname(output_bam)
     os.makedirs(output_dir, exist_ok=True)
 
-    cmd = (
-        f"hisat2 -x {index_prefix} -1 {fastq1} -2 {fastq2} -p {threads} | "
-        f"samtools sort -@ {threads} -O BAM -o {output_bam} -"
-    )
+    description = f"HISAT2 alignment and sorting -> {output_bam}"
+    print(f"Running: {description}")
+
+    try:
+        metrics = align_sample(
+            index_prefix, fastq1, fastq2, output_bam, threads, threads,
+            tmpdir=tmpdir, sort_mem=sort_mem or auto_sort_mem(1, threads),
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"✗ {description} failed")
+        print(f"Error message: {e}")
+        sys.exit(1)
 
-    run_command(cmd, f"HISAT2 alignment and sorting -> {output_bam}")
+    print(
+        f"✓ {description} completed in {metrics['seconds']:.1f}s "
+        f"({metrics.get('reads_per_second', '-')} reads/s, "
+        f"{metrics.get('overall_alignment_rate', '-')}% overall alignment rate)"
+    )
 
 
 def run_stringtie(bam_file, gtf_file, output_gtf, threads):
@@ -135,7 +155,10 @@ def process_single_sample(args, sample_info, index_prefix):
     if os.path.exists(bam_file):
         print(f"✓ BAM file already exists, skipping alignment: {bam_file}")
     else:
-        run_hisat2_mapping(index_prefix, fastq1, fastq2, bam_file, args.threads)
+        run_hisat2_mapping(
+            index_prefix, fastq1, fastq2, bam_file, args.threads,
+            tmpdir=args.tmpdir, sort_mem=args.sort_mem,
+        )
 
     # 2. StringTie quantification
     if os.path.exists(stringtie_output):
@@ -156,6 +179,8 @@ def process_single_sample(args, sample_info, index_prefix):
         if os.path.exists(bam_file):
             os.remove(bam_file)
             print(f"✓ Removed BAM file: {bam_file}")
+        if os.path.exists(f"{bam_file}.bai"):
+            os.remove(f"{bam_file}.bai")
     else:
         print(f"✓ BAM file retained: {bam_file}")
 
@@ -507,6 +532,16 @@ def main():
     parser.add_argument(
         "-t", "--threads", type=int, default=8, help="Number of threads (default: 8)"
     )
+    parser.add_argument(
+        "--tmpdir",
+        default=None,
+        help="Local scratch directory for samtools sort temp files and the BAM being written",
+    )
+    parser.add_argument(
+        "--sort-mem",
+        default=None,
+        help="Memory per samtools sort thread, e.g. 2G (default: from the available RAM)",
+    )
     # parser.add_argument(
     #     "-k",
     #     "--keep_transcript",
@@ -0,0 +1,36 @@
+import io
+
+from biohelpers.process_blast_result import (
+    iter_top_hits, iter_top_hits_parallel, write_top_hits,
+)
+
+
+def write_grouped_table(path):
+    """Grouped outfmt 6 table with comment and blank lines inside query blocks"""
+    with open(path, 'w') as f:
+        f.write('# BLASTN 2.12.0+\n')
+        for q in range(300):
+            for j in range(1 + q % 6):
+                evalue = '1' if (q + j) % 4 == 0 else '1e-10'
+                f.write(f'q{q}\ts{j}\t{90 + j % 3}\t100\t1\t0\t1\t100\t1\t100\t{evalue}\t{50 + (q * j) % 40}\n')
+                if q % 2 == 0:
+                    f.write('# comment inside a query\n')
+                if q % 3 == 0:
+                    f.write('\n')
+
+
+def render(results):
+    out = io.StringIO()
+    write_top_hits(results, out)
+    return out.getvalue()
+
+
+def test_parallel_grouped_matches_serial(tmp_path):
+    path = tmp_path / 'grouped.blast.txt'
+    write_grouped_table(path)
+    with open(path) as f:
+        expected = render(iter_top_hits(f, 1e-5, 3, grouped=True))
+
+    for workers in range(2, 17):
+        result = render(iter_top_hits_parallel(str(path), 1e-5, 3, workers, grouped=True))
+        assert result == expected